@@ -14,3 +14,18 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# Set by scripts/uwsgi_config.py, which has the master preload the app
+if os.environ.get('WSGI_WARMUP') == '1':
+    from core.warmup import warm_up
+
+    warm_up(application)
+
+try:
+    import uwsgi
+except ImportError:
+    pass
+else:
+    from recipe.images import drain
+
+    uwsgi.atexit = drain
@@ -1,10 +1,16 @@
 # DJANFO ADMIN CUSTOM
 
+from datetime import datetime, timezone
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from django.template.response import TemplateResponse
 from django.utils.translation import gettext_lazy as _
 
 from core import models
+from core.profiling import list_profiles, load_profile
 
 
 class UserAdmin(BaseUserAdmin):
@@ -41,7 +47,62 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Read-only pages for the profiles stored by core/profiling.py."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def render(self, request, template, title, **context):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        return TemplateResponse(request, template, {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': title,
+            **context,
+        })
+
+    def changelist_view(self, request, extra_context=None):
+        profiles = list_profiles()
+        for profile in profiles:
+            profile['created'] = datetime.fromtimestamp(
+                profile['created'], timezone.utc
+            )
+
+        return self.render(
+            request,
+            'admin/core/requestprofile/profile_list.html',
+            _('Request profiles'),
+            profiles=profiles
+        )
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        profile = load_profile(object_id)
+        if profile is None:
+            raise Http404
+
+        profile['created'] = datetime.fromtimestamp(
+            profile['created'], timezone.utc
+        )
+
+        return self.render(
+            request,
+            'admin/core/requestprofile/profile_detail.html',
+            f'{profile["method"]} {profile["path"]}',
+            profile=profile
+        )
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Recipe)
 admin.site.register(models.Tag)
 admin.site.register(models.Ingredient)
+admin.site.register(models.RequestProfile, RequestProfileAdmin)
@@ -0,0 +1,166 @@
+"""
+Async views for the ASGI run mode.
+
+Under ASGI Django serves requests on an event loop, but runs every sync
+view in a thread started for that request. pooled() turns a sync view
+into an async one that runs it on a pool of ASYNC_DB_THREADS threads
+instead, so slow clients only cost the event loop a socket, and at most
+that many requests per process use the database at once, each thread
+keeping its own persistent connection.
+
+ASYNC_VIEWS switches the read-heavy endpoints to these views. It is on
+by default when the app is started from app/asgi.py. Only GET and HEAD
+requests use the pool; other methods run where Django runs any sync view.
+
+ASGIHandler is the handler app/asgi.py serves the app with.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.handlers import asgi
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from core.db import close_unhealthy_connections
+from core.profiling import profiled
+
+POOLED_METHODS = ('GET', 'HEAD')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_DB_THREADS,
+                thread_name_prefix='async-db',
+            )
+
+    return _executor
+
+
+def _run(view, request, args, kwargs):
+    # Pool threads see no request_started or request_finished signals, so
+    # they look after their connections the way those signals would.
+    close_old_connections()
+    close_unhealthy_connections()
+
+    try:
+        with profiled():
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response = response.render()
+
+        return response
+    finally:
+        close_old_connections()
+
+
+def _run_unpooled(view, request, args, kwargs):
+    with profiled():
+        return view(request, *args, **kwargs)
+
+
+def pooled(view):
+    """Return an async view running the sync view on the pool.
+
+    Requests other than GET and HEAD run on the thread Django runs sync
+    views on, so writes do not take up the pool.
+    """
+
+    @functools.wraps(view)
+    async def pooled_view(request, *args, **kwargs):
+        if request.method not in POOLED_METHODS:
+            return await sync_to_async(_run_unpooled, thread_sensitive=True)(
+                view, request, args, kwargs
+            )
+
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+
+        return await loop.run_in_executor(
+            _get_executor(), context.run, _run, view, request, args, kwargs
+        )
+
+    return pooled_view
+
+
+def pooled_patterns(patterns, names):
+    """Serve the URL patterns called one of names with pooled views.
+
+    Returns patterns unchanged unless ASYNC_VIEWS is on.
+    """
+    if not settings.ASYNC_VIEWS:
+        return patterns
+
+    return [
+        URLPattern(
+            pattern.pattern,
+            pooled(pattern.callback),
+            pattern.default_args,
+            pattern.name
+        ) if getattr(pattern, 'name', None) in names else pattern
+        for pattern in patterns
+    ]
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """ASGI handler reading streaming responses off the event loop.
+
+    Django 3.2 iterates a StreamingHttpResponse on the event loop, where
+    the queries of the recipe bulk import and export generators raise
+    SynchronousOnlyOperation. This handler fetches each part on the thread
+    the sync view ran on instead.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        response_headers = [
+            (
+                header.encode('ascii') if isinstance(header, str) else header,
+                value.encode('latin1') if isinstance(value, str) else value,
+            )
+            for header, value in response.items()
+        ]
+        for cookie in response.cookies.values():
+            response_headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()
+            ))
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        try:
+            while True:
+                part = await next_part(parts, None)
+                if part is None:
+                    break
+
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+
+            await send({'type': 'http.response.body'})
+        finally:
+            await sync_to_async(response.close, thread_sensitive=True)()
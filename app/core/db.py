@@ -0,0 +1,74 @@
+"""
+Database connection helpers.
+"""
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+_query_wrappers = contextvars.ContextVar('query_wrappers', default=())
+
+
+def close_unhealthy_connections(**kwargs):
+    """Close persistent connections the database no longer accepts.
+
+    Django only re-checks a persistent connection after an error occurred
+    on it, so a connection dropped by the server or the network would
+    otherwise fail the first query of the next request. Only connections
+    unused for DB_CONN_HEALTH_CHECK_IDLE seconds are checked, as those are
+    the ones likely to have been dropped, so busy processes do not pay a
+    round trip per request.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+
+    idle_since = time.monotonic() - settings.DB_CONN_HEALTH_CHECK_IDLE
+
+    for conn in connections.all():
+        if conn.connection is None or conn.in_atomic_block:
+            continue
+
+        if getattr(conn, 'last_used_at', 0) > idle_since:
+            continue
+
+        if conn.is_usable():
+            conn.last_used_at = time.monotonic()
+        else:
+            conn.close()
+
+
+def _run_query_wrappers(execute, sql, params, many, context):
+    for wrapper in reversed(_query_wrappers.get()):
+        execute = functools.partial(wrapper, execute)
+
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        context['connection'].last_used_at = time.monotonic()
+
+
+def install_query_wrappers(connection, **kwargs):
+    """Let wrap_queries reach every connection, whatever its thread, and
+    record when the connection was last used."""
+    connection.last_used_at = time.monotonic()
+
+    if _run_query_wrappers not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_run_query_wrappers)
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Run a database execute wrapper around the queries of this context.
+
+    Unlike connection.execute_wrapper() it also sees queries made on
+    other threads on behalf of the context, like sync views served under
+    ASGI and the pooled views of core/async_views.py.
+    """
+    token = _query_wrappers.set(_query_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _query_wrappers.reset(token)
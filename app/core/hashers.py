@@ -0,0 +1,173 @@
+"""
+Password hashers with tunable cost, run in a bounded number of slots.
+
+Hashing a password is the most CPU hungry thing the API does. Every
+hash and verification made through these hashers takes one of
+PASSWORD_HASH_WORKERS slots shared by all the processes of the
+container, and at most PASSWORD_HASH_QUEUE more callers may wait for a
+free slot. Callers that cannot get a place within PASSWORD_HASH_WAIT
+seconds are turned away with a 503, so a burst of logins cannot occupy
+every worker and starve other traffic. The proxy also rate limits the
+login and sign-up endpoints.
+
+Slots are lock files in PASSWORD_HASH_LOCK_DIR held with flock, which
+the kernel releases if the process holding one dies.
+
+The hashers keep the algorithm names of the Django hashers they extend,
+so stored hashes stay valid. When PASSWORD_HASHER or the costs change,
+Django rehashes passwords with the preferred settings as users log in.
+"""
+import fcntl
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+)
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.metrics import HASH_DURATION, HASH_REJECTED, HASH_WAIT
+
+POLL_INTERVAL = 0.01
+
+_hashing = threading.local()
+
+
+class PasswordHashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign-ins at once, try again shortly.')
+    default_code = 'password_hashing_busy'
+
+
+class PasswordHashingBusyMiddleware(MiddlewareMixin):
+    """Answer PasswordHashingBusy raised outside DRF views, such as on the
+    admin login, with a 503 instead of a server error."""
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, PasswordHashingBusy):
+            return HttpResponse(
+                str(exception.detail),
+                status=exception.status_code,
+                content_type='text/plain'
+            )
+
+
+def slot_paths(kind, count):
+    """Return the paths of the lock files of count slots of kind."""
+    return [
+        os.path.join(settings.PASSWORD_HASH_LOCK_DIR, f'{kind}-{i}.lock')
+        for i in range(count)
+    ]
+
+
+def _try_lock(kind, count):
+    """Return the descriptor of a free slot of kind, locked, or None."""
+    os.makedirs(settings.PASSWORD_HASH_LOCK_DIR, exist_ok=True)
+
+    for path in slot_paths(kind, count):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+
+        return fd
+
+    return None
+
+
+def _wait_for_slot():
+    queued = _try_lock('queue', settings.PASSWORD_HASH_QUEUE)
+    if queued is None:
+        return None
+
+    try:
+        deadline = time.monotonic() + settings.PASSWORD_HASH_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            slot = _try_lock('hash', settings.PASSWORD_HASH_WORKERS)
+            if slot is not None:
+                return slot
+
+        return None
+    finally:
+        os.close(queued)
+
+
+def run_hashing(func, operation, algorithm, *args):
+    """Run func(*args) in a hashing slot and return its result.
+
+    Raises PasswordHashingBusy when every slot and place in the queue stays
+    taken for PASSWORD_HASH_WAIT seconds.
+    """
+    if getattr(_hashing, 'active', False):
+        # Verifying a PBKDF2 hash encodes the password again
+        return func(*args)
+
+    queued = time.perf_counter()
+    slot = _try_lock('hash', settings.PASSWORD_HASH_WORKERS)
+    if slot is None:
+        slot = _wait_for_slot()
+        if slot is None:
+            HASH_REJECTED.inc()
+            raise PasswordHashingBusy()
+
+    HASH_WAIT.observe(time.perf_counter() - queued)
+    _hashing.active = True
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        _hashing.active = False
+        os.close(slot)
+        HASH_DURATION.labels(
+            operation=operation,
+            algorithm=algorithm
+        ).observe(time.perf_counter() - start)
+
+
+class PooledHasherMixin:
+    """Run the hashing of a Django hasher in a hashing slot."""
+
+    def encode(self, password, salt, *args):
+        return run_hashing(
+            super().encode, 'encode', self.algorithm, password, salt, *args
+        )
+
+    def verify(self, password, encoded):
+        return run_hashing(
+            super().verify, 'verify', self.algorithm, password, encoded
+        )
+
+
+class PBKDF2Hasher(PooledHasherMixin, PBKDF2PasswordHasher):
+    """PBKDF2 with PASSWORD_PBKDF2_ITERATIONS iterations."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2Hasher(PooledHasherMixin, Argon2PasswordHasher):
+    """Argon2id with the PASSWORD_ARGON2_* costs."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
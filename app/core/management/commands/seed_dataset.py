@@ -0,0 +1,359 @@
+"""
+DJANGO Command to load a large synthetic dataset for benchmarking.
+"""
+import io
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, Tag, User
+from recipe.search import update_search_vectors
+
+ADJECTIVES = [
+    'Crispy', 'Creamy', 'Spicy', 'Smoky', 'Roasted', 'Grilled', 'Baked',
+    'Slow cooked', 'Quick', 'Classic', 'Rustic', 'Zesty', 'Sweet', 'Tangy',
+]
+DISHES = [
+    'soup', 'salad', 'curry', 'stew', 'pie', 'pasta', 'risotto', 'tacos',
+    'noodles', 'casserole', 'omelette', 'bowl', 'sandwich', 'tart',
+]
+TAG_WORDS = [
+    'Vegan', 'Vegetarian', 'Dinner', 'Lunch', 'Breakfast', 'Dessert',
+    'Quick', 'Healthy', 'Spicy', 'Comfort', 'Party', 'Budget', 'Summer',
+    'Winter', 'Gluten free', 'Kids', 'Italian', 'Indian', 'Mexican',
+    'Thai', 'French', 'Japanese', 'Baking', 'Grill', 'Snack',
+]
+INGREDIENT_WORDS = [
+    'Salt', 'Pepper', 'Garlic', 'Onion', 'Tomato', 'Rice', 'Flour',
+    'Butter', 'Eggs', 'Milk', 'Chicken', 'Beef', 'Lentils', 'Basil',
+    'Lemon', 'Potato', 'Carrot', 'Ginger', 'Chilli', 'Cumin', 'Sugar',
+    'Olive oil', 'Cheese', 'Spinach', 'Mushroom', 'Coconut milk',
+    'Chickpeas', 'Honey', 'Yoghurt', 'Pasta', 'Bread', 'Apple',
+]
+
+
+def zipf_weights(size, skew):
+    """Cumulative weights choosing item i in proportion to 1/(i+1)^skew."""
+    total = 0
+    cumulative = []
+    for i in range(size):
+        total += 1 / (i + 1) ** skew
+        cumulative.append(total)
+
+    return cumulative
+
+
+def spread(total, cumulative):
+    """Split total between items in proportion to their weights."""
+    shares = []
+    previous = 0
+    for weight in cumulative:
+        shares.append(weight - previous)
+        previous = weight
+
+    counts = [int(total * share / previous) for share in shares]
+    for i in range(total - sum(counts)):
+        counts[i] += 1
+
+    return counts
+
+
+def names(words, count):
+    """Return count distinct names built from words."""
+    return [
+        words[i % len(words)] + (f' {i // len(words)}' if i >= len(words)
+                                 else '')
+        for i in range(count)
+    ]
+
+
+class CopyWriter:
+    """Buffer rows per table and stream them to Postgres with COPY.
+
+    Tables are flushed in the order they were registered, so rows are
+    always copied after the rows they reference.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.tables = {}
+        self.buffered = 0
+        self.copied = 0
+
+    def add_table(self, model, fields):
+        columns = [model._meta.get_field(name).column for name in fields]
+        self.tables[model._meta.db_table] = [columns, io.StringIO()]
+
+    def write(self, model, *values):
+        buffer = self.tables[model._meta.db_table][1]
+        buffer.write('\t'.join(
+            r'\N' if value is None else str(value) for value in values
+        ))
+        buffer.write('\n')
+
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with connection.cursor() as cursor:
+            for table, (columns, buffer) in self.tables.items():
+                if not buffer.tell():
+                    continue
+
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {table} ({", ".join(columns)}) FROM STDIN',
+                    buffer
+                )
+                self.tables[table][1] = io.StringIO()
+
+        self.copied += self.buffered
+        self.buffered = 0
+
+
+class Command(BaseCommand):
+    """
+    DJANGO COMMAND TO SEED A SYNTHETIC DATASET
+
+    Users own a skewed share of the recipes, and recipes pick their tags
+    and ingredients with a skew too, so a few users, tags and ingredients
+    are far more popular than the rest, like real data. The same options
+    and seed always produce the same rows. Every user gets the same
+    password hash, which is computed once.
+    """
+
+    help = 'Load synthetic users, recipes, tags and ingredients with COPY.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument(
+            '--tags-per-user',
+            type=int,
+            default=100,
+        )
+        parser.add_argument(
+            '--ingredients-per-user',
+            type=int,
+            default=200,
+        )
+        parser.add_argument(
+            '--tags-per-recipe',
+            type=int,
+            default=3,
+            help='Most tags a recipe is linked to.',
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=int,
+            default=8,
+            help='Most ingredients a recipe is linked to.',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.0,
+            help='Zipf exponent of the popularity of users, tags and '
+                 'ingredients. 0 spreads them evenly.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='password')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100000,
+            help='Rows buffered in memory between COPY statements.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        seed = options['seed']
+        email_prefix = f'seed-{seed}-'
+
+        for option in ('users', 'tags_per_user', 'ingredients_per_user',
+                       'ingredients_per_recipe', 'batch_size'):
+            if options[option] < 1:
+                raise CommandError(f'--{option.replace("_", "-")} must be '
+                                   'at least 1.')
+
+        for option in ('recipes', 'tags_per_recipe'):
+            if options[option] < 0:
+                raise CommandError(f'--{option.replace("_", "-")} must not '
+                                   'be negative.')
+
+        if User.objects.filter(email__startswith=email_prefix).exists():
+            raise CommandError(
+                f'Users of seed {seed} already exist, use another --seed.'
+            )
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # Rows are copied in dependency order, so foreign keys can
+                # be checked as they arrive instead of queued until commit.
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+                cursor.execute(
+                    'LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE'.format(
+                        ', '.join(model._meta.db_table for model in (
+                            User, Tag, Ingredient, Recipe
+                        ))
+                    )
+                )
+
+            first_ids = {
+                model: (model.objects.aggregate(last=Max('id'))['last']
+                        or 0) + 1
+                for model in (User, Tag, Ingredient, Recipe)
+            }
+
+            writer = self.generate(options, email_prefix, first_ids)
+
+            self.stdout.write('Updating sequences, counts and search...')
+            self.finish(first_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {writer.copied} rows.'
+        ))
+
+    def generate(self, options, email_prefix, first_ids):
+        """Copy every generated row and return the writer used."""
+        seed = options['seed']
+        skew = options['skew']
+        tags_per_user = options['tags_per_user']
+        ingredients_per_user = options['ingredients_per_user']
+
+        writer = CopyWriter(options['batch_size'])
+        writer.add_table(User, [
+            'id', 'password', 'is_superuser', 'email', 'name', 'is_active',
+            'is_staff',
+        ])
+        writer.add_table(Tag, ['id', 'user', 'name', 'recipe_count'])
+        writer.add_table(Ingredient, ['id', 'user', 'name', 'recipe_count'])
+        writer.add_table(Recipe, [
+            'id', 'user', 'title', 'description', 'time_minutes', 'price',
+            'link', 'image', 'image_status', 'image_staged', 'updated_at',
+        ])
+        writer.add_table(Recipe.tags.through, ['recipe', 'tag'])
+        writer.add_table(Recipe.ingredients.through, ['recipe', 'ingredient'])
+
+        # Popularity rank of each user
+        ranks = list(range(options['users']))
+        random.Random(seed).shuffle(ranks)
+        recipe_counts = spread(
+            options['recipes'],
+            zipf_weights(options['users'], skew)
+        )
+
+        tag_names = names(TAG_WORDS, tags_per_user)
+        tag_weights = zipf_weights(tags_per_user, skew)
+        ingredient_names = names(INGREDIENT_WORDS, ingredients_per_user)
+        ingredient_weights = zipf_weights(ingredients_per_user, skew)
+
+        password = make_password(options['password'])
+        updated_at = timezone.now().isoformat()
+
+        user_id = first_ids[User]
+        tag_id = first_ids[Tag]
+        ingredient_id = first_ids[Ingredient]
+        recipe_id = first_ids[Recipe]
+
+        for index, rank in enumerate(ranks):
+            rng = random.Random(f'{seed}:{index}')
+
+            writer.write(
+                User,
+                user_id,
+                password,
+                'f',
+                f'{email_prefix}{index}@example.com',
+                f'Seed user {index}',
+                't',
+                'f',
+            )
+            for name in tag_names:
+                writer.write(Tag, tag_id, user_id, name, 0)
+                tag_id += 1
+            for name in ingredient_names:
+                writer.write(Ingredient, ingredient_id, user_id, name, 0)
+                ingredient_id += 1
+
+            first_tag = tag_id - tags_per_user
+            first_ingredient = ingredient_id - ingredients_per_user
+
+            for i in range(recipe_counts[rank]):
+                linked_ingredients = sorted(set(rng.choices(
+                    range(ingredients_per_user),
+                    cum_weights=ingredient_weights,
+                    k=rng.randint(1, options['ingredients_per_recipe'])
+                )))
+                linked_tags = sorted(set(rng.choices(
+                    range(tags_per_user),
+                    cum_weights=tag_weights,
+                    k=rng.randint(0, options['tags_per_recipe'])
+                )))
+
+                writer.write(
+                    Recipe,
+                    recipe_id,
+                    user_id,
+                    f'{rng.choice(ADJECTIVES)} '
+                    f'{ingredient_names[linked_ingredients[0]].lower()} '
+                    f'{rng.choice(DISHES)}',
+                    f'Serves {rng.randint(1, 8)}.',
+                    rng.randint(5, 240),
+                    f'{rng.uniform(1, 100):.2f}',
+                    '',
+                    '',
+                    '',
+                    '',
+                    updated_at,
+                )
+                for offset in linked_tags:
+                    writer.write(
+                        Recipe.tags.through, recipe_id, first_tag + offset
+                    )
+                for offset in linked_ingredients:
+                    writer.write(
+                        Recipe.ingredients.through,
+                        recipe_id,
+                        first_ingredient + offset
+                    )
+                recipe_id += 1
+
+            user_id += 1
+
+        writer.flush()
+
+        return writer
+
+    def finish(self, first_ids):
+        """Fix up what COPY skips: sequences, recipe counts and search."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [User, Tag, Ingredient, Recipe]
+            ):
+                cursor.execute(sql)
+
+        for model, field in ((Tag, 'tags'), (Ingredient, 'ingredients')):
+            relation = getattr(Recipe, field).field
+            through = relation.remote_field.through
+            target = f'{relation.m2m_reverse_field_name()}_id'
+            counts = through.objects.filter(
+                **{target: OuterRef('pk')}
+            ).order_by().values(target).annotate(
+                total=Count('*')
+            ).values('total')
+
+            model.objects.filter(id__gte=first_ids[model]).update(
+                recipe_count=Coalesce(Subquery(counts), 0)
+            )
+
+        update_search_vectors(
+            Recipe.objects.filter(id__gte=first_ids[Recipe])
+        )
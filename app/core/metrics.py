@@ -0,0 +1,215 @@
+"""
+Per-endpoint request metrics exported in the Prometheus text format.
+
+MetricsMiddleware records the latency, SQL query count and SQL time of a
+sample of requests, labelled with the name of the view that served them,
+plus the time the API views using SerializerMetricsMixin spend building
+serializer data. When the PROMETHEUS_MULTIPROC_DIR environment variable
+points at a directory, each uWSGI worker writes its samples to
+memory-mapped files there and the /metrics view adds up the files of
+every worker. The /metrics view is only served with the METRICS_TOKEN.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from core.db import wrap_queries
+
+REQUESTS = Counter(
+    'django_http_requests_sampled',
+    'Requests sampled for metrics.',
+    ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'django_http_request_duration_seconds',
+    'Time to produce a response.',
+    ['view', 'method'],
+)
+DB_QUERIES = Histogram(
+    'django_http_request_db_queries',
+    'SQL queries run per request.',
+    ['view', 'method'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, float('inf')),
+)
+DB_DURATION = Histogram(
+    'django_http_request_db_duration_seconds',
+    'Time spent running SQL queries per request.',
+    ['view', 'method'],
+)
+SERIALIZER_DURATION = Histogram(
+    'django_http_request_serializer_duration_seconds',
+    'Time spent building serializer data per request.',
+    ['view', 'method'],
+)
+
+HASH_DURATION = Histogram(
+    'password_hash_duration_seconds',
+    'Time to hash or verify a password.',
+    ['operation', 'algorithm'],
+)
+HASH_WAIT = Histogram(
+    'password_hash_wait_seconds',
+    'Time a password hash waited for a free hashing thread.',
+)
+HASH_REJECTED = Counter(
+    'password_hash_rejected',
+    'Password hashes turned away because the hashing pool was full.',
+)
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Totals collected while a sampled request is served."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_duration = 0.0
+        self.serializer_duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Used as a database execute wrapper.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_duration += time.perf_counter() - start
+
+    def time_serializer(self, to_representation):
+        """Wrap to_representation to add its time to serializer_duration."""
+
+        def timed(instance):
+            start = time.perf_counter()
+            try:
+                return to_representation(instance)
+            finally:
+                self.serializer_duration += time.perf_counter() - start
+
+        return timed
+
+
+class SerializerMetricsMixin:
+    """Time the serializers of a sampled request to this API view.
+
+    Only the serializers the view gets are timed, on that instance; the
+    nested serializers and list items they render are part of its time.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+
+        metrics = _current.get()
+        if metrics is not None:
+            serializer.to_representation = metrics.time_serializer(
+                serializer.to_representation
+            )
+
+        return serializer
+
+
+class MetricsMiddleware:
+    """Record metrics for METRICS_SAMPLE_RATE of requests."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if asyncio.iscoroutinefunction(get_response):
+            # Tell Django to await this middleware, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+
+        try:
+            with wrap_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.record(request, response, metrics, time.perf_counter() - start)
+
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+
+        try:
+            with wrap_queries(metrics):
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        self.record(request, response, metrics, time.perf_counter() - start)
+
+        return response
+
+    def record(self, request, response, metrics, duration):
+        match = request.resolver_match
+        labels = {
+            'view': match.view_name if match else '<unmatched>',
+            'method': request.method,
+        }
+
+        REQUESTS.labels(status=response.status_code, **labels).inc()
+        REQUEST_LATENCY.labels(**labels).observe(duration)
+        DB_QUERIES.labels(**labels).observe(metrics.queries)
+        DB_DURATION.labels(**labels).observe(metrics.db_duration)
+        SERIALIZER_DURATION.labels(**labels).observe(
+            metrics.serializer_duration
+        )
+
+
+def metrics_view(request):
+    """Return the collected metrics in the Prometheus text format.
+
+    Denied unless METRICS_TOKEN is set and sent as a bearer token.
+    """
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+        request.headers.get('Authorization', ''),
+        f'Bearer {settings.METRICS_TOKEN}'
+    ):
+        return HttpResponseForbidden()
+
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(
+        generate_latest(registry),
+        content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,63 @@
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags and ingredients sharing a name for the same user.
+
+    Recipes linked to a duplicate are relinked to the oldest row with that
+    name so the (user, name) unique constraints can be added. A recipe
+    keeps a single link to it, however many of the duplicates it had.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+
+    for model_name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        relation = Recipe._meta.get_field(field)
+        through = relation.remote_field.through
+        target = relation.m2m_reverse_field_name()
+
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep_id=Min('id'),
+            total=Count('id'),
+        ).filter(total__gt=1)
+
+        for duplicate in duplicates:
+            merged_ids = list(
+                model.objects.filter(
+                    user=duplicate['user'],
+                    name=duplicate['name'],
+                ).exclude(
+                    id=duplicate['keep_id']
+                ).values_list('id', flat=True)
+            )
+
+            links = through.objects.filter(**{f'{target}_id__in': merged_ids})
+
+            linked = through.objects.filter(
+                **{f'{target}_id': duplicate['keep_id']}
+            ).values('recipe_id')
+            links.filter(recipe_id__in=linked).delete()
+
+            first_links = links.order_by().values('recipe_id').annotate(
+                first_id=Min('id')
+            ).values('first_id')
+            links.exclude(id__in=first_links).delete()
+
+            links.update(**{f'{target}_id': duplicate['keep_id']})
+
+            model.objects.filter(id__in=merged_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,72 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+def add_unique_constraint_concurrently(table, name):
+    """Build a (user_id, name) unique constraint without blocking writes.
+
+    The index is built with CREATE INDEX CONCURRENTLY and then attached as
+    the constraint, which only needs a brief lock on the table.
+    """
+    return migrations.RunSQL(
+        sql=[
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table} (user_id, name)',
+            f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+            f'UNIQUE USING INDEX {name}',
+        ],
+        reverse_sql=f'ALTER TABLE {table} DROP CONSTRAINT {name}',
+    )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0009_merge_duplicate_names'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', '-id'],
+                name='recipe_user_id_idx'
+            ),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                add_unique_constraint_concurrently(
+                    'core_tag',
+                    'unique_tag_name_per_user'
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='tag',
+                    constraint=models.UniqueConstraint(
+                        fields=('user', 'name'),
+                        name='unique_tag_name_per_user'
+                    ),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                add_unique_constraint_concurrently(
+                    'core_ingredient',
+                    'unique_ingredient_name_per_user'
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='ingredient',
+                    constraint=models.UniqueConstraint(
+                        fields=('user', 'name'),
+                        name='unique_ingredient_name_per_user'
+                    ),
+                ),
+            ],
+        ),
+    ]
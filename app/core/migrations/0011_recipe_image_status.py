@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_tag_ingredient_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_staged',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=20),
+        ),
+        migrations.RunSQL(
+            "UPDATE core_recipe SET image_status = 'ready' "
+            "WHERE image IS NOT NULL AND image <> ''",
+            migrations.RunSQL.noop,
+        ),
+    ]
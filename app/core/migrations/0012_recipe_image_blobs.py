@@ -0,0 +1,55 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:51
+
+import core.models
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_image_references(apps, schema_editor):
+    """Create a blob for every image already used by recipes."""
+    Recipe = apps.get_model('core', 'Recipe')
+    ImageBlob = apps.get_model('core', 'ImageBlob')
+
+    references = Recipe.objects.exclude(
+        image__isnull=True
+    ).exclude(
+        image=''
+    ).values('image').annotate(
+        total=Count('id')
+    ).order_by()
+
+    ImageBlob.objects.bulk_create(
+        (
+            ImageBlob(name=reference['image'], refcount=reference['total'])
+            for reference in references.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.ContentAddressedStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.RunPython(
+            count_image_references,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:55
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_search_vectors(apps, schema_editor):
+    """Compute the search vector of existing recipes in batches.
+
+    The expression is the one recipe/search.py used when this migration
+    was written: title, ingredient names and description, weighted A, B
+    and C.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    config = getattr(settings, 'RECIPE_SEARCH_CONFIG', 'english')
+
+    ingredient_names = Recipe.ingredients.through.objects.filter(
+        recipe_id=OuterRef('pk')
+    ).order_by().values('recipe_id').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+
+    vector = (
+        SearchVector('title', weight='A', config=config) +
+        SearchVector(Subquery(ingredient_names), weight='B', config=config) +
+        SearchVector('description', weight='C', config=config)
+    )
+
+    ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+
+    for start in range(0, len(ids), 1000):
+        Recipe.objects.filter(id__in=ids[start:start + 1000]).update(
+            search_vector=vector
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_recipe_image_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            fill_search_vectors,
+            migrations.RunPython.noop,
+        ),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:58
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_recipe_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ] + [
+        # Django 3.2 wraps an OpClass expression in parentheses, which
+        # Postgres rejects, so the index SQL is written out here.
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    sql=f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                        f'ON core_{model} USING gin (UPPER(name) gin_trgm_ops)',
+                    reverse_sql=f'DROP INDEX CONCURRENTLY IF EXISTS {name}',
+                ),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name=model,
+                    index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name=name),
+                ),
+            ],
+        )
+        for model, name in (
+            ('ingredient', 'ingredient_name_trgm_idx'),
+            ('tag', 'tag_name_trgm_idx'),
+        )
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:04
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    """Set the recipe count of existing tags and ingredients."""
+    Recipe = apps.get_model('core', 'Recipe')
+
+    for model_name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        relation = Recipe._meta.get_field(field)
+        through = relation.remote_field.through
+        target = f'{relation.m2m_reverse_field_name()}_id'
+
+        counts = through.objects.filter(
+            **{target: OuterRef('pk')}
+        ).order_by().values(target).annotate(
+            total=Count('*')
+        ).values('total')
+
+        model.objects.update(
+            recipe_count=Coalesce(Subquery(counts), 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0014_tag_ingredient_name_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            count_recipes,
+            migrations.RunPython.noop,
+        ),
+        AddIndexConcurrently(
+            model_name='ingredient',
+            index=models.Index(condition=models.Q(('recipe_count__gt', 0)), fields=['user', 'name'], name='ingredient_assigned_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='tag',
+            index=models.Index(condition=models.Q(('recipe_count__gt', 0)), fields=['user', 'name'], name='tag_assigned_name_idx'),
+        ),
+    ]
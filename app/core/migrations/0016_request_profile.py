@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_tag_ingredient_recipe_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+            ],
+            options={
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Upper
 from django.conf import settings
+from core.storage import ContentAddressedStorage
 import uuid
 import os
 from django.contrib.auth.models import (
@@ -62,6 +66,11 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class Recipe(models.Model):
 
+    class ImageStatus(models.TextChoices):
+        PENDING = 'pending'
+        READY = 'ready'
+        FAILED = 'failed'
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -73,11 +82,39 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=ContentAddressedStorage(),
+    )
+    image_status = models.CharField(
+        max_length=20,
+        choices=ImageStatus.choices,
+        blank=True,
+    )
+    image_staged = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+
+class ImageBlob(models.Model):
+    """A stored image file and the number of recipes using it."""
+
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
 class Tag(models.Model):
 
     user = models.ForeignKey(
@@ -85,6 +122,26 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
     name = models.CharField(max_length=255)
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                condition=models.Q(recipe_count__gt=0),
+                name='tag_assigned_name_idx'
+            ),
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='tag_name_trgm_idx'
+            ),
+        ]
 
     def __str__(self):
 
@@ -97,6 +154,41 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE,
     )
     name = models.CharField(max_length=255)
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                condition=models.Q(recipe_count__gt=0),
+                name='ingredient_assigned_name_idx'
+            ),
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='ingredient_name_trgm_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class RequestProfile(models.Model):
+    """Request profile stored on disk by core/profiling.py.
+
+    Has no table; it only gives the profiles a place in the admin.
+    """
+
+    id = models.CharField(max_length=64, primary_key=True)
+
+    class Meta:
+        managed = False
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.id
@@ -0,0 +1,264 @@
+"""
+On-demand profiles of slow requests.
+
+ProfilingMiddleware runs a request under cProfile and records the SQL it
+executes when either a staff user sends the ``X-Profile: 1`` header, or
+the request falls in the PROFILING_SAMPLE_RATE sample and takes longer
+than PROFILING_THRESHOLD_MS. Profiles are written as JSON files to
+PROFILING_DIR, which keeps only the PROFILING_KEEP most recent ones, and
+are browsed from the admin.
+
+The header is only honoured once the session or API token of the request
+has been checked to belong to staff, so nobody else can make requests
+take the expensive profiled path.
+"""
+import asyncio
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+
+from rest_framework.exceptions import APIException
+
+from core.db import wrap_queries
+from user.authentication import CachedTokenAuthentication
+
+PROFILE_HEADER = 'X-Profile'
+STATS_LINES = 60
+
+_profiler = contextvars.ContextVar('profiler', default=None)
+
+
+class QueryLog:
+    """Execute wrapper recording the SQL of a request and its timings."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'duration_ms': (time.perf_counter() - start) * 1000,
+            })
+
+
+def format_stats(profiler):
+    """Return the functions taking the most cumulative time as text."""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(STATS_LINES)
+
+    return stream.getvalue()
+
+
+def is_staff_request(request):
+    """Return whether the session or API token of request is staff's.
+
+    Tokens are checked through the token cache, as the API views check
+    them.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except APIException:
+        return False
+
+    return result is not None and result[0].is_staff
+
+
+def _profile_path(profile_id):
+    return os.path.join(settings.PROFILING_DIR, f'{profile_id}.json')
+
+
+def save_profile(profile):
+    """Write profile to disk and drop the oldest beyond PROFILING_KEEP."""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+
+    profile_id = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+    path = _profile_path(profile_id)
+    temp = os.path.join(settings.PROFILING_DIR, f'.{profile_id}')
+
+    with open(temp, 'w') as f:
+        json.dump({'id': profile_id, **profile}, f)
+    os.replace(temp, path)
+
+    for old in profile_ids()[settings.PROFILING_KEEP:]:
+        try:
+            os.remove(_profile_path(old))
+        except FileNotFoundError:
+            # Pruned by another worker
+            pass
+
+    return profile_id
+
+
+def profile_ids():
+    """Return the ids of the stored profiles, newest first."""
+    try:
+        names = os.listdir(settings.PROFILING_DIR)
+    except FileNotFoundError:
+        return []
+
+    return sorted(
+        (name[:-5] for name in names
+         if name.endswith('.json') and not name.startswith('.')),
+        key=lambda profile_id: int(profile_id.split('-')[0]),
+        reverse=True
+    )
+
+
+def load_profile(profile_id):
+    """Return a stored profile, or None if it does not exist."""
+    if profile_id not in profile_ids():
+        return None
+
+    try:
+        with open(_profile_path(profile_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def list_profiles():
+    """Return the stored profiles without their stats, newest first."""
+    profiles = []
+    for profile_id in profile_ids():
+        profile = load_profile(profile_id)
+        if profile is not None:
+            profile['query_count'] = len(profile.pop('queries'))
+            del profile['stats']
+            profiles.append(profile)
+
+    return profiles
+
+
+@contextmanager
+def profiled():
+    """Profile this thread for the request of the context, if profiled.
+
+    Used by the pooled views of core/async_views.py, as the profiler of
+    an async request would otherwise only see the event loop.
+    """
+    profiler = _profiler.get()
+    if profiler is None:
+        yield
+        return
+
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+
+class ProfilingMiddleware:
+    """Profile requests asked for by staff or sampled and slow."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if asyncio.iscoroutinefunction(get_response):
+            # Tell Django to await this middleware, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def requested(self, request):
+        """Return whether staff asked for a profile of request."""
+        return (
+            request.headers.get(PROFILE_HEADER) == '1' and
+            is_staff_request(request)
+        )
+
+    def sampled(self):
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        requested = self.requested(request)
+        if not (requested or self.sampled()):
+            return self.get_response(request)
+
+        query_log = QueryLog()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+
+        with wrap_queries(query_log):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+
+        self.finish(
+            request, response, query_log, profiler, requested,
+            (time.perf_counter() - start) * 1000
+        )
+
+        return response
+
+    async def __acall__(self, request):
+        # Looking at a session user or token may query the database
+        requested = request.headers.get(PROFILE_HEADER) == '1' and (
+            await sync_to_async(self.requested)(request)
+        )
+        if not (requested or self.sampled()):
+            return await self.get_response(request)
+
+        query_log = QueryLog()
+        profiler = cProfile.Profile()
+        token = _profiler.set(profiler)
+        start = time.perf_counter()
+
+        try:
+            with wrap_queries(query_log):
+                response = await self.get_response(request)
+        finally:
+            _profiler.reset(token)
+
+        await sync_to_async(self.finish)(
+            request, response, query_log, profiler, requested,
+            (time.perf_counter() - start) * 1000
+        )
+
+        return response
+
+    def finish(self, request, response, query_log, profiler, requested,
+               duration_ms):
+        """Store the profile if it was asked for by staff or is slow."""
+        user = getattr(request, 'user', None)
+
+        if requested or duration_ms >= settings.PROFILING_THRESHOLD_MS:
+            match = request.resolver_match
+            save_profile({
+                'created': time.time(),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'view': match.view_name if match else '',
+                'status': response.status_code,
+                'user': user.get_username() if user else '',
+                'requested': requested,
+                'duration_ms': duration_ms,
+                'queries': query_log.queries,
+                'stats': format_stats(profiler),
+            })
@@ -0,0 +1,68 @@
+"""
+Content-addressed file storage.
+"""
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming each file after a hash of its content.
+
+    The directory comes from the name being saved and the file name from
+    the SHA-256 of the content, so saving bytes that are already stored
+    returns the existing name instead of writing another copy.
+    """
+
+    def content_name(self, name, content):
+        """Return the name content is stored under in name's directory."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+
+        ext = os.path.splitext(name)[1].lower()
+
+        return posixpath.join(
+            posixpath.dirname(name),
+            digest[:2],
+            f'{digest}{ext}'
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        return super().save(
+            self.content_name(name, content),
+            content,
+            max_length=max_length
+        )
+
+    def get_available_name(self, name, max_length=None):
+        # Equal names hold equal content, so an existing file is reused.
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+
+        # Write under a temporary name and move it into place, so a
+        # concurrent save of the same content never sees a partial file.
+        directory, filename = posixpath.split(name)
+        temporary = super()._save(
+            posixpath.join(directory, f'.{uuid.uuid4()}-{filename}'),
+            content
+        )
+        os.replace(self.path(temporary), self.path(name))
+
+        return name
@@ -0,0 +1,180 @@
+"""
+Test the pooled async views of the ASGI run mode.
+"""
+import asyncio
+import json
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from app.asgi import application
+from core.async_views import pooled, pooled_patterns
+from core.db import wrap_queries
+from core.models import Recipe, Tag
+from recipe import views
+from recipe.urls import router
+
+
+class PooledViewTests(TransactionTestCase):
+    """Test sync views served from the thread pool."""
+
+    def setUp(self):
+
+        # Pool threads open their own connections; close them after each
+        # view so the test database can be flushed.
+        patcher = patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password@testuser'
+        )
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        self.view = pooled(views.TagViewSet.as_view({'get': 'list'}))
+
+    def get(self, method='get'):
+
+        request = getattr(APIRequestFactory(), method)('/api/recipe/')
+        force_authenticate(request, self.user)
+
+        return async_to_sync(self.view)(request)
+
+    def test_pooled_view(self):
+        """Test the pooled view is async and serves the sync view."""
+
+        self.assertTrue(asyncio.iscoroutinefunction(self.view))
+        self.assertTrue(self.view.csrf_exempt)
+
+        res = self.get()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.is_rendered)
+        self.assertEqual([tag['name'] for tag in res.data], ['Vegan'])
+
+    def test_writes_not_pooled(self):
+        """Test methods other than GET and HEAD do not use the pool."""
+
+        self.view = pooled(views.RecipeViewSet.as_view({'post': 'create'}))
+
+        with patch('core.async_views._get_executor') as get_executor:
+            res = self.get(method='post')
+
+        get_executor.assert_not_called()
+        self.assertEqual(res.status_code, 400)
+
+    def test_pooled_view_queries_wrapped(self):
+        """Test queries made on the pool reach the wrappers of the caller."""
+
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with wrap_queries(record):
+            self.get()
+
+        self.assertTrue(any('core_tag' in sql for sql in queries))
+
+    def test_pooled_patterns(self):
+        """Test only the named patterns are pooled, and only when enabled."""
+
+        self.assertIs(
+            pooled_patterns(router.urls, ['tag-list']),
+            router.urls
+        )
+
+        with override_settings(ASYNC_VIEWS=True):
+            patterns = pooled_patterns(router.urls, ['tag-list'])
+
+        pooled_names = {
+            pattern.name for pattern in patterns
+            if asyncio.iscoroutinefunction(pattern.callback)
+        }
+        self.assertEqual(pooled_names, {'tag-list'})
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ASGIHandlerTests(TransactionTestCase):
+    """Test requests served through the ASGI application."""
+
+    def setUp(self):
+
+        patcher = patch.dict(connection.settings_dict, {'CONN_MAX_AGE': 0})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password@testuser'
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    @async_to_sync
+    async def request(self, method, path, body=b''):
+
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': b'',
+            'headers': [
+                (b'host', b'testserver'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+                (b'content-type', b'application/x-ndjson'),
+                (b'content-length', str(len(body)).encode()),
+            ],
+        })
+        await communicator.send_input({
+            'type': 'http.request',
+            'body': body,
+        })
+
+        start = await communicator.receive_output(timeout=10)
+        content = b''
+        while True:
+            message = await communicator.receive_output(timeout=10)
+            content += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        return start['status'], content
+
+    def test_bulk_import_and_export_streamed(self):
+        """Test streaming responses querying the database are served."""
+
+        body = '\n'.join(json.dumps({
+            'title': f'Recipe {i}',
+            'time_minutes': 10,
+            'price': '5.50',
+            'tags': [{'name': 'Imported'}],
+        }) for i in range(3)).encode()
+
+        status, content = self.request(
+            'POST', '/api/recipe/recipes/bulk/', body
+        )
+
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            json.loads(content.splitlines()[-1]),
+            {'created': 3, 'failed': 0}
+        )
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+
+        status, content = self.request('GET', '/api/recipe/recipes/export/')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            sorted(json.loads(line)['title'] for line in content.splitlines()),
+            ['Recipe 0', 'Recipe 1', 'Recipe 2']
+        )
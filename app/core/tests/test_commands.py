@@ -6,9 +6,14 @@ from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
-from django.core.management import call_command
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import Count
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Ingredient, Recipe, Tag, User
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -35,3 +40,110 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class SeedDatasetTests(TestCase):
+    """Test loading a synthetic dataset."""
+
+    def seed(self, **options):
+
+        options = {
+            'users': 5,
+            'recipes': 40,
+            'tags_per_user': 10,
+            'ingredients_per_user': 20,
+            **options,
+        }
+
+        call_command('seed_dataset', stdout=StringIO(), **options)
+
+    def snapshot(self):
+
+        return (
+            list(User.objects.values_list(
+                'id', 'email', 'name'
+            ).order_by('id')),
+            list(Recipe.objects.values_list(
+                'id', 'user_id', 'title', 'time_minutes', 'price'
+            ).order_by('id')),
+            list(Recipe.tags.through.objects.values_list(
+                'recipe_id', 'tag_id'
+            ).order_by('recipe_id', 'tag_id')),
+            list(Recipe.ingredients.through.objects.values_list(
+                'recipe_id', 'ingredient_id'
+            ).order_by('recipe_id', 'ingredient_id')),
+        )
+
+    def test_seed_dataset(self):
+        """Test users own recipes linked to their tags and ingredients."""
+
+        self.seed(skew=1.5)
+
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Tag.objects.count(), 50)
+        self.assertEqual(Ingredient.objects.count(), 100)
+        self.assertEqual(Recipe.objects.count(), 40)
+
+        per_user = sorted(
+            User.objects.annotate(total=Count('recipe'))
+            .values_list('total', flat=True)
+        )
+        self.assertLess(per_user[0], per_user[-1])
+
+        for recipe in Recipe.objects.prefetch_related('tags', 'ingredients'):
+            for item in [*recipe.tags.all(), *recipe.ingredients.all()]:
+                self.assertEqual(item.user_id, recipe.user_id)
+
+        for model in (Tag, Ingredient):
+            for item in model.objects.annotate(total=Count('recipe')):
+                self.assertEqual(item.recipe_count, item.total)
+
+        self.assertFalse(
+            Recipe.objects.filter(search_vector__isnull=True).exists()
+        )
+
+        user = User.objects.first()
+        self.assertTrue(user.check_password('password'))
+
+    def test_seed_dataset_deterministic(self):
+        """Test the same seed loads the same rows."""
+
+        self.seed(batch_size=7)
+        first = self.snapshot()
+
+        User.objects.all().delete()
+        self.seed()
+
+        self.assertEqual(self.snapshot(), first)
+
+    def test_seed_dataset_sequences_reset(self):
+        """Test rows created after seeding do not clash with seeded ids."""
+
+        self.seed()
+
+        user = User.objects.create_user(email='new@example.com')
+        recipe = Recipe.objects.create(
+            user=user,
+            title='New',
+            time_minutes=5,
+            price='1.00'
+        )
+
+        self.assertGreater(user.id, 5)
+        self.assertGreater(recipe.id, 40)
+
+    def test_seed_dataset_twice_rejected(self):
+
+        self.seed()
+
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_seed_dataset_negative_counts_rejected(self):
+        """Test negative counts are rejected before anything is seeded."""
+
+        for option in ('recipes', 'tags_per_recipe'):
+            with self.assertRaisesMessage(CommandError, 'must not be'):
+                self.seed(**{option: -1})
+
+        self.assertFalse(User.objects.exists())
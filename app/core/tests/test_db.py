@@ -0,0 +1,104 @@
+"""
+Test the database connection helpers.
+"""
+import time
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.db import close_unhealthy_connections, install_query_wrappers
+
+
+def mock_connection(usable=True, connected=True, in_atomic_block=False,
+                    idle=True):
+
+    conn = MagicMock()
+    conn.connection = object() if connected else None
+    conn.in_atomic_block = in_atomic_block
+    conn.is_usable.return_value = usable
+    conn.last_used_at = 0 if idle else time.monotonic()
+
+    return conn
+
+
+@patch('core.db.connections')
+class HealthCheckTests(SimpleTestCase):
+    """Test closing unhealthy persistent connections."""
+
+    def test_unusable_connection_closed(self, patched_connections):
+        """Test a connection failing the health check is closed."""
+
+        conn = mock_connection(usable=False)
+        patched_connections.all.return_value = [conn]
+
+        close_unhealthy_connections()
+
+        conn.close.assert_called_once()
+
+    def test_usable_connection_kept(self, patched_connections):
+        """Test a healthy connection is reused."""
+
+        conn = mock_connection()
+        patched_connections.all.return_value = [conn]
+
+        close_unhealthy_connections()
+
+        conn.close.assert_not_called()
+
+    def test_recently_used_connection_not_checked(self, patched_connections):
+        """Test connections used in the idle window skip the round trip."""
+
+        conn = mock_connection(usable=False, idle=False)
+        patched_connections.all.return_value = [conn]
+
+        close_unhealthy_connections()
+
+        conn.is_usable.assert_not_called()
+        conn.close.assert_not_called()
+
+    def test_unopened_connection_not_checked(self, patched_connections):
+        """Test no connection is opened just to check it."""
+
+        conn = mock_connection(connected=False)
+        patched_connections.all.return_value = [conn]
+
+        close_unhealthy_connections()
+
+        conn.is_usable.assert_not_called()
+
+    def test_connection_in_transaction_not_checked(self, patched_connections):
+        """Test connections inside a transaction are left alone."""
+
+        conn = mock_connection(usable=False, in_atomic_block=True)
+        patched_connections.all.return_value = [conn]
+
+        close_unhealthy_connections()
+
+        conn.close.assert_not_called()
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_health_checks_disabled(self, patched_connections):
+        """Test nothing is checked when health checks are disabled."""
+
+        conn = mock_connection(usable=False)
+        patched_connections.all.return_value = [conn]
+
+        close_unhealthy_connections()
+
+        conn.is_usable.assert_not_called()
+
+
+class LastUsedTests(TestCase):
+    """Test connections record when they were last used."""
+
+    def test_query_records_last_use(self):
+        """Test running a query updates the last use of the connection."""
+
+        install_query_wrappers(connection)
+        connection.last_used_at = 0
+
+        get_user_model().objects.exists()
+
+        self.assertGreater(connection.last_used_at, 0)
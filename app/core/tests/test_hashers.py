@@ -0,0 +1,171 @@
+"""
+Test the pooled password hashers.
+"""
+import fcntl
+import os
+import tempfile
+from contextlib import ExitStack, contextmanager
+
+from prometheus_client import REGISTRY
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import hashers
+
+TOKEN_URL = reverse('user:token')
+
+ARGON2_FIRST = [
+    'core.hashers.Argon2Hasher',
+    'core.hashers.PBKDF2Hasher',
+]
+
+
+def create_user(**params):
+
+    return get_user_model().objects.create_user(
+        email='test@example.com',
+        password='password@testuser',
+        **params
+    )
+
+
+@contextmanager
+def hold_slots(kind, count):
+    """Hold slots the way another process would, through their files."""
+    with ExitStack() as stack:
+        for path in hashers.slot_paths(kind, count):
+            f = stack.enter_context(open(path, 'a'))
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        yield
+
+
+def hash_count(operation, algorithm):
+
+    return REGISTRY.get_sample_value(
+        'password_hash_duration_seconds_count',
+        {'operation': operation, 'algorithm': algorithm}
+    ) or 0
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class HasherTests(TestCase):
+    """Test hashing policy, rehashing and admission limits."""
+
+    def setUp(self):
+
+        self.client = APIClient()
+
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        self.lock_dir = lock_dir.name
+
+        override = self.settings(PASSWORD_HASH_LOCK_DIR=self.lock_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def login(self):
+
+        return self.client.post(TOKEN_URL, {
+            'email': 'test@example.com',
+            'password': 'password@testuser',
+        })
+
+    def test_hashing_recorded(self):
+        """Test hashes made through the pool are timed."""
+
+        encoded = hash_count('encode', 'pbkdf2_sha256')
+        verified = hash_count('verify', 'pbkdf2_sha256')
+
+        user = create_user()
+        user.check_password('password@testuser')
+
+        self.assertEqual(hash_count('encode', 'pbkdf2_sha256'), encoded + 1)
+        self.assertEqual(hash_count('verify', 'pbkdf2_sha256'), verified + 1)
+
+    def test_rehash_on_login_when_cost_changes(self):
+        """Test logging in upgrades a hash made with an old cost."""
+
+        user = create_user()
+
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        user.refresh_from_db()
+        self.assertIn('$2000$', user.password)
+
+    def test_rehash_on_login_when_hasher_changes(self):
+        """Test logging in moves a password to the preferred hasher."""
+
+        user = create_user()
+
+        with self.settings(
+            PASSWORD_HASHERS=ARGON2_FIRST,
+            PASSWORD_ARGON2_MEMORY_COST=1024,
+            PASSWORD_ARGON2_PARALLELISM=1,
+        ):
+            res = self.login()
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+            user.refresh_from_db()
+            self.assertEqual(
+                identify_hasher(user.password).algorithm,
+                'argon2'
+            )
+            self.assertTrue(user.check_password('password@testuser'))
+
+    @override_settings(PASSWORD_HASH_WAIT=0.05)
+    def test_login_rejected_when_slots_taken(self):
+        """Test logins are turned away while every slot is taken."""
+
+        create_user()
+        rejected = REGISTRY.get_sample_value(
+            'password_hash_rejected_total'
+        ) or 0
+
+        with hold_slots('hash', 2), hold_slots('queue', 16):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(
+            REGISTRY.get_sample_value('password_hash_rejected_total'),
+            rejected + 1
+        )
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @override_settings(PASSWORD_HASH_WAIT=0.05)
+    def test_queued_login_rejected_after_wait(self):
+        """Test a queued login gives up when no slot frees up in time."""
+
+        create_user()
+
+        with hold_slots('hash', 2):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(
+            sorted(os.listdir(self.lock_dir)),
+            ['hash-0.lock', 'hash-1.lock', 'queue-0.lock']
+        )
+
+    @override_settings(PASSWORD_HASH_WAIT=0)
+    def test_admin_login_busy(self):
+        """Test the admin login answers 503 while every slot is taken."""
+
+        create_user()
+
+        with hold_slots('hash', 2), hold_slots('queue', 16):
+            res = self.client.post('/admin/login/', {
+                'username': 'test@example.com',
+                'password': 'password@testuser',
+            })
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
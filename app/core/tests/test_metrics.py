@@ -0,0 +1,133 @@
+"""
+Test the request metrics middleware and endpoint.
+"""
+from prometheus_client import REGISTRY
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from core.models import Tag
+
+TAGS_URL = reverse('recipe:tag-list')
+METRICS_URL = reverse('metrics')
+
+LABELS = {'view': 'recipe:tag-list', 'method': 'GET'}
+
+
+def sample(name, **labels):
+
+    return REGISTRY.get_sample_value(name, {**LABELS, **labels}) or 0
+
+
+class MetricsTests(TestCase):
+    """Test per-endpoint request metrics."""
+
+    def setUp(self):
+
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='password@testuser'
+        )
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_request_recorded(self):
+        """Test a request is counted with its queries and timings."""
+
+        requests = sample('django_http_requests_sampled_total', status='200')
+        queries = sample('django_http_request_db_queries_sum')
+        serializer = sample(
+            'django_http_request_serializer_duration_seconds_count'
+        )
+        serializer_time = sample(
+            'django_http_request_serializer_duration_seconds_sum'
+        )
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            sample('django_http_requests_sampled_total', status='200'),
+            requests + 1
+        )
+        self.assertGreater(
+            sample('django_http_request_db_queries_sum'),
+            queries
+        )
+        self.assertEqual(
+            sample('django_http_request_serializer_duration_seconds_count'),
+            serializer + 1
+        )
+        self.assertGreater(
+            sample('django_http_request_serializer_duration_seconds_sum'),
+            serializer_time
+        )
+
+    def test_serializer_classes_not_patched(self):
+        """Test serializers are timed by the views, not on their class."""
+
+        for cls in (serializers.Serializer, serializers.ListSerializer):
+            self.assertEqual(
+                cls.data.fget.__module__,
+                'rest_framework.serializers'
+            )
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_request_not_sampled(self):
+        """Test requests outside the sample are not recorded."""
+
+        before = sample('django_http_request_duration_seconds_count')
+
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(
+            sample('django_http_request_duration_seconds_count'),
+            before
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        """Test the metrics are exported in the text format."""
+
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(
+            METRICS_URL,
+            HTTP_AUTHORIZATION='Bearer secret'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(
+            b'django_http_request_duration_seconds_count{'
+            b'method="GET",view="recipe:tag-list"}',
+            res.content
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_endpoint_token(self):
+        """Test the metrics endpoint requires the configured token."""
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(
+            METRICS_URL,
+            HTTP_AUTHORIZATION='Bearer secret'
+        )
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_metrics_endpoint_denied_without_token(self):
+        """Test the metrics endpoint is denied when no token is set."""
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 403)
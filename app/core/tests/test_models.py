@@ -5,6 +5,7 @@ from decimal import Decimal
 from core import models
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 
 def create_user(email="user @example.com", password="testpassword"):
 
@@ -104,6 +105,15 @@ class ModelTests(TestCase):
 
         self.assertEqual(str(tag), tag.name)
 
+    def test_tag_name_unique_per_user(self):
+
+        user = create_user()
+
+        models.Tag.objects.create(user=user, name="test_tag")
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name="test_tag")
+
     def test_create_ingredient(self):
 
         user = create_user()
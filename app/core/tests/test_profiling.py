@@ -0,0 +1,143 @@
+"""
+Test profiling of slow requests.
+"""
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.profiling import list_profiles, load_profile, profile_ids
+
+TAGS_URL = reverse('recipe:tag-list')
+PROFILES_URL = reverse('admin:core_requestprofile_changelist')
+
+
+def create_user(**params):
+
+    return get_user_model().objects.create_user(
+        password='password@testuser',
+        **params
+    )
+
+
+class ProfilingTests(TestCase):
+    """Test capturing and browsing request profiles."""
+
+    def setUp(self):
+
+        self.profiles_dir = tempfile.TemporaryDirectory()
+        settings = override_settings(
+            PROFILING_DIR=self.profiles_dir.name,
+            PROFILING_SAMPLE_RATE=0,
+            PROFILING_THRESHOLD_MS=500,
+            PROFILING_KEEP=3,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(self.profiles_dir.cleanup)
+
+        self.staff = create_user(email='staff@example.com', is_staff=True)
+        self.client = APIClient()
+
+    def authenticate(self, user):
+
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_profile_requested_by_staff(self):
+        """Test the profile header of a staff user stores a profile."""
+
+        self.authenticate(self.staff)
+
+        res = self.client.get(TAGS_URL, HTTP_X_PROFILE='1')
+
+        self.assertEqual(res.status_code, 200)
+
+        profiles = list_profiles()
+
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0]['path'], TAGS_URL)
+        self.assertEqual(profiles[0]['view'], 'recipe:tag-list')
+        self.assertEqual(profiles[0]['user'], self.staff.email)
+
+        profile = load_profile(profiles[0]['id'])
+
+        self.assertIn('core_tag', profile['queries'][-1]['sql'])
+        self.assertIn('cumulative', profile['stats'])
+
+    def test_profile_header_ignored_for_other_users(self):
+        """Test nobody but staff can turn the profiler on."""
+
+        with patch('core.profiling.cProfile.Profile') as profile:
+            self.client.get(TAGS_URL, HTTP_X_PROFILE='1')
+
+            self.authenticate(create_user(email='user@example.com'))
+            self.client.get(TAGS_URL, HTTP_X_PROFILE='1')
+
+            self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+            self.client.get(TAGS_URL, HTTP_X_PROFILE='1')
+
+        profile.assert_not_called()
+        self.assertEqual(profile_ids(), [])
+
+    def test_sampled_profile_threshold(self):
+        """Test sampled requests are kept only above the threshold."""
+
+        self.authenticate(self.staff)
+
+        with self.settings(PROFILING_SAMPLE_RATE=1):
+            self.client.get(TAGS_URL)
+
+        self.assertEqual(profile_ids(), [])
+
+        with self.settings(PROFILING_SAMPLE_RATE=1, PROFILING_THRESHOLD_MS=0):
+            self.client.get(TAGS_URL)
+
+        self.assertEqual(len(profile_ids()), 1)
+
+    def test_oldest_profiles_dropped(self):
+        """Test only the PROFILING_KEEP latest profiles are kept."""
+
+        self.authenticate(self.staff)
+
+        for i in range(5):
+            self.client.get(TAGS_URL, {'page': i}, HTTP_X_PROFILE='1')
+
+        self.assertEqual(
+            [profile['path'] for profile in list_profiles()],
+            [f'{TAGS_URL}?page={i}' for i in (4, 3, 2)]
+        )
+
+    def test_admin_pages(self):
+        """Test profiles are listed and shown in the admin."""
+
+        self.authenticate(self.staff)
+        self.client.get(TAGS_URL, HTTP_X_PROFILE='1')
+        profile_id = profile_ids()[0]
+
+        admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='Zaq!2wsx'
+        )
+        self.client.force_login(admin_user)
+
+        res = self.client.get(PROFILES_URL)
+
+        self.assertContains(res, f'GET {TAGS_URL}')
+
+        res = self.client.get(
+            reverse('admin:core_requestprofile_change', args=[profile_id])
+        )
+
+        self.assertContains(res, 'core_tag')
+
+        res = self.client.get(
+            reverse('admin:core_requestprofile_change', args=['missing'])
+        )
+
+        self.assertEqual(res.status_code, 404)
@@ -0,0 +1,45 @@
+"""
+Tests for the content-addressed storage.
+"""
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = ContentAddressedStorage(location=self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_named_by_content(self):
+        """Test files are named after the hash of their content"""
+
+        name = self.storage.save('uploads/a.JPG', ContentFile(b'photo'))
+
+        self.assertEqual(
+            name,
+            'uploads/55/55c64d0fcd6f9d5f7c828093857e3fdf'
+            'da68478bb4e9bd24d481ef391c7804e8.jpg'
+        )
+
+    def test_same_content_stored_once(self):
+        """Test saving equal content twice reuses the first file"""
+
+        first = self.storage.save('uploads/a.jpg', ContentFile(b'photo'))
+        second = self.storage.save('uploads/b.jpg', ContentFile(b'photo'))
+        other = self.storage.save('uploads/c.jpg', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        directory = first.rsplit('/', 1)[0]
+        self.assertEqual(len(self.storage.listdir(directory)[1]), 1)
+
+        with self.storage.open(first) as stored:
+            self.assertEqual(stored.read(), b'photo')
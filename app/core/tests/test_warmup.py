@@ -0,0 +1,35 @@
+"""
+Test warming up the app before uWSGI forks.
+"""
+import gc
+
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase, override_settings
+
+from core.warmup import WARMUP_URLS, warm_up
+
+
+class WarmUpTests(SimpleTestCase):
+    """Test the warm-up requests sent by the uWSGI master."""
+
+    def tearDown(self):
+
+        gc.unfreeze()
+
+    @override_settings(ALLOWED_HOSTS=['.example.com', 'api.example.com'])
+    def test_warm_up_without_database(self):
+        """Test every warm-up request is answered without any query."""
+
+        statuses = warm_up(get_wsgi_application())
+
+        self.assertEqual(set(statuses), set(WARMUP_URLS))
+        self.assertEqual(statuses['api-schema'], 200)
+        for status in statuses.values():
+            self.assertLess(status, 500)
+
+    def test_objects_frozen(self):
+        """Test objects built by the warm-up are left out of collections."""
+
+        warm_up(get_wsgi_application())
+
+        self.assertGreater(gc.get_freeze_count(), 0)
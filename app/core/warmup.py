@@ -0,0 +1,76 @@
+"""
+Warm up the app before uWSGI forks its workers.
+
+scripts/uwsgi_config.py has the master load app/wsgi.py, which then sends
+a few requests through the app, so URL resolution, the middleware, views,
+serializers and the API schema are imported and built once in the master
+and shared copy-on-write with every worker, instead of being built by each
+worker on its first requests.
+
+The requests are anonymous so they stay out of the database, and they must
+not start threads, which would not survive the fork.
+"""
+import gc
+import io
+import logging
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.db import connections
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+WARMUP_URLS = [
+    'api-schema',
+    'recipe:recipe-list',
+    'recipe:tag-list',
+    'recipe:ingredient-list',
+    'user:me',
+]
+
+
+def _host():
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != '*' and not host.startswith('.'):
+            return host
+
+    return 'localhost'
+
+
+def warm_up(application):
+    """Send GET requests for WARMUP_URLS through application.
+
+    Returns the status code of each request, keyed by URL name.
+    """
+    statuses = {}
+
+    for name in WARMUP_URLS:
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': reverse(name),
+            'HTTP_HOST': _host(),
+            'wsgi.input': io.BytesIO(),
+        }
+        setup_testing_defaults(environ)
+
+        def start_response(status, headers, exc_info=None):
+            statuses[name] = int(status.split()[0])
+
+        response = application(environ, start_response)
+        try:
+            for chunk in response:
+                pass
+        finally:
+            response.close()
+
+    logger.info('Warm-up requests: %s', statuses)
+
+    # Workers must not share the master's sockets
+    connections.close_all()
+
+    # Keep the collector from touching, and so copying, what is shared
+    gc.collect()
+    gc.freeze()
+
+    return statuses
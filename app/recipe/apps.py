@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, pre_delete
 
 
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        from core.models import Recipe
+        from recipe.counts import release_recipe_counts, update_recipe_counts
+        from recipe.images import release_recipe_image
+
+        post_delete.connect(release_recipe_image, sender='core.Recipe')
+        pre_delete.connect(release_recipe_counts, sender='core.Recipe')
+
+        for through in (Recipe.tags.through, Recipe.ingredients.through):
+            m2m_changed.connect(update_recipe_counts, sender=through)
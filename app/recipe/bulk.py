@@ -0,0 +1,120 @@
+"""
+Bulk import of recipes from a JSON Lines stream.
+"""
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient
+)
+from recipe.cache import bump_version
+from recipe.search import update_search_vectors
+from recipe.serializers import (
+    RecipeDetailSerializer,
+    add_related,
+    get_or_create_by_name,
+)
+
+RELATED_FIELDS = (
+    ('tags', Tag),
+    ('ingredients', Ingredient),
+)
+RELATED_NAMES = {field for field, model in RELATED_FIELDS}
+
+
+def _parse_lines(stream):
+    """Yield (line number, data, errors) for each non blank line."""
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            yield number, json.loads(line), None
+        except ValueError as exc:
+            yield number, None, {'non_field_errors': [f'Invalid JSON: {exc}']}
+
+
+def _create_chunk(user, rows):
+    """Insert validated rows, their tags, ingredients and links in bulk."""
+    with transaction.atomic():
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                **{
+                    key: value for key, value in data.items()
+                    if key not in RELATED_NAMES
+                }
+            )
+            for data in rows
+        ])
+
+        for field, model in RELATED_FIELDS:
+            names = list(dict.fromkeys(
+                item['name'] for data in rows for item in data.get(field, [])
+            ))
+            objs = get_or_create_by_name(model, user, names)
+
+            add_related(field, [
+                (recipe, objs[item['name']])
+                for recipe, data in zip(recipes, rows)
+                for item in data.get(field, [])
+            ])
+
+        update_search_vectors(
+            Recipe.objects.filter(id__in=[recipe.id for recipe in recipes])
+        )
+
+        # Even if the import stops before the end, this chunk is committed
+        transaction.on_commit(lambda: bump_version(user.pk))
+
+    return recipes
+
+
+def import_recipes(stream, context, chunk_size):
+    """Import recipes from stream, yielding a result for every line.
+
+    Lines are read, validated and inserted chunk_size at a time so memory
+    use does not depend on the size of the upload. Each chunk is committed
+    on its own. The last result is a summary of the whole import.
+    """
+    user = context['request'].user
+    lines = _parse_lines(stream)
+    created = failed = 0
+
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            break
+
+        results = []
+        valid = []
+        for number, data, errors in chunk:
+            if errors is None:
+                serializer = RecipeDetailSerializer(data=data, context=context)
+                if serializer.is_valid():
+                    valid.append((number, serializer.validated_data))
+                    continue
+                errors = serializer.errors
+
+            results.append(
+                {'line': number, 'status': 'error', 'errors': errors}
+            )
+
+        if valid:
+            recipes = _create_chunk(user, [data for number, data in valid])
+            results.extend(
+                {'line': number, 'status': 'created', 'id': recipe.id}
+                for (number, data), recipe in zip(valid, recipes)
+            )
+
+        created += len(valid)
+        failed += len(chunk) - len(valid)
+
+        yield from sorted(results, key=lambda result: result['line'])
+
+    yield {'created': created, 'failed': failed}
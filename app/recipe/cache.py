@@ -0,0 +1,83 @@
+"""
+Per-user response cache for the recipe APIs.
+
+Every cached response is keyed on a per-user version number. Any write to
+a user's recipes, tags or ingredients bumps that version, which orphans
+all of the user's cached responses at once instead of deleting them key
+by key. The same version is used to build the recipe list ETag.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import urlencode
+
+from rest_framework.response import Response
+
+
+def _cache():
+    return caches[settings.RECIPE_API_CACHE]
+
+
+def _version_key(user_id):
+    return f'recipe-api:{user_id}:version'
+
+
+def _new_version():
+    # Versions start from the clock so a version lost to cache eviction is
+    # never reissued, which keeps ETags built from it unique.
+    return time.time_ns()
+
+
+def get_version(user_id):
+    """Return the current cache version for a user."""
+    return _cache().get_or_set(_version_key(user_id), _new_version, None)
+
+
+def bump_version(user_id):
+    """Invalidate every cached response for a user."""
+    cache = _cache()
+
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.set(_version_key(user_id), _new_version(), None)
+
+
+def response_cache_key(request, prefix):
+    """Return the cache key for a request to a list endpoint."""
+    user_id = request.user.pk
+    params = urlencode(sorted(request.query_params.lists()), doseq=True)
+    digest = hashlib.md5(f'{request.path}?{params}'.encode()).hexdigest()
+
+    return f'recipe-api:{user_id}:v{get_version(user_id)}:{prefix}:{digest}'
+
+
+class CachedListMixin:
+    """Cache list responses per user and invalidate them on writes."""
+
+    def list(self, request, *args, **kwargs):
+        key = response_cache_key(request, self.basename)
+
+        data = _cache().get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+
+        if response.status_code == 200:
+            _cache().set(key, response.data, settings.RECIPE_API_CACHE_TIMEOUT)
+
+        return response
+
+    def invalidate_cache(self):
+        bump_version(self.request.user.pk)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.invalidate_cache()
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        self.invalidate_cache()
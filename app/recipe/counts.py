@@ -0,0 +1,113 @@
+"""
+Denormalized recipe counts of tags and ingredients.
+
+Every tag and ingredient stores how many recipes are linked to it, so
+listing only the ones in use is an indexed filter instead of a join
+against the through table. Counts are changed with relative updates in
+the same transaction as the links they count: explicitly by the bulk
+link helpers in recipe/serializers.py, and through signals for related
+manager calls and recipe deletions.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Case, F, IntegerField, Value, When
+
+from core.models import Recipe
+
+RELATED_FIELDS = ['tags', 'ingredients']
+
+
+def _relation(field):
+    """Return the through model, target model and target column of field."""
+    relation = getattr(Recipe, field).field
+
+    return (
+        relation.remote_field.through,
+        relation.related_model,
+        f'{relation.m2m_reverse_field_name()}_id',
+    )
+
+
+def adjust_recipe_counts(model, deltas):
+    """Add deltas, a mapping of object id to change, to recipe_count.
+
+    All objects are updated with one query, whatever their changes.
+    """
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(pk)
+
+    if not by_delta:
+        return
+
+    model.objects.filter(
+        pk__in=[pk for pks in by_delta.values() for pk in pks]
+    ).update(
+        recipe_count=F('recipe_count') + Case(
+            *[
+                When(pk__in=pks, then=Value(delta))
+                for delta, pks in by_delta.items()
+            ],
+            output_field=IntegerField(),
+        )
+    )
+
+
+def count_new_links(model, objs):
+    """Count one more recipe for each of objs, repeats included."""
+    adjust_recipe_counts(model, Counter(obj.pk for obj in objs))
+
+
+def _uncount_links(model, links, target):
+    """Count one recipe less for the target of every link."""
+    model.objects.filter(pk__in=links.values(target)).update(
+        recipe_count=F('recipe_count') - 1
+    )
+
+
+def update_recipe_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep recipe counts in step with related manager changes.
+
+    Added ids are counted after the insert, which only reports new links.
+    Removed links are uncounted before the delete, while they can still
+    be read.
+    """
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+
+    for field in RELATED_FIELDS:
+        through, model, target = _relation(field)
+        if sender is through:
+            break
+    else:
+        return
+
+    if reverse:
+        links = through.objects.filter(**{target: instance.pk})
+        if action == 'pre_remove':
+            links = links.filter(recipe_id__in=pk_set)
+
+        change = len(pk_set) if action == 'post_add' else -links.count()
+        adjust_recipe_counts(type(instance), {instance.pk: change})
+
+    elif action == 'post_add':
+        adjust_recipe_counts(model, dict.fromkeys(pk_set, 1))
+
+    else:
+        links = through.objects.filter(recipe_id=instance.pk)
+        if action == 'pre_remove':
+            links = links.filter(**{f'{target}__in': pk_set})
+
+        _uncount_links(model, links, target)
+
+
+def release_recipe_counts(sender, instance, **kwargs):
+    """Uncount the tags and ingredients of a recipe about to be deleted."""
+    for field in RELATED_FIELDS:
+        through, model, target = _relation(field)
+        _uncount_links(
+            model,
+            through.objects.filter(recipe_id=instance.pk),
+            target
+        )
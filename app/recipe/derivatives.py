@@ -0,0 +1,82 @@
+"""
+Resized derivatives of recipe images.
+
+Derivatives are generated the first time a size is requested and kept in
+MEDIA_ROOT next to the originals, so later requests only need a redirect.
+They are saved through the default storage under the name of the image
+they were made from, which is shared by every recipe using that image.
+"""
+import io
+import os
+import posixpath
+
+from PIL import Image, features
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+DERIVATIVES_DIR = 'derivatives'
+
+FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+
+
+def webp_supported():
+    return features.check('webp')
+
+
+def choose_format(accept):
+    """Return the derivative extension to serve for an Accept header."""
+    if 'image/webp' in (accept or '') and webp_supported():
+        return 'webp'
+
+    return 'jpg'
+
+
+def derivative_name(image_name, size, ext):
+    """Return the storage name of a derivative of image_name."""
+    stem = os.path.splitext(posixpath.basename(image_name))[0]
+
+    return posixpath.join(DERIVATIVES_DIR, size, f'{stem}.{ext}')
+
+
+def get_or_create_derivative(image, size, ext):
+    """Return the storage name of a derivative, generating it if missing."""
+    storage = default_storage
+    name = derivative_name(image.name, size, ext)
+
+    if storage.exists(name):
+        return name
+
+    max_size = settings.RECIPE_IMAGE_DERIVATIVES[size]
+
+    with image.open('rb'), Image.open(image) as original:
+        original.thumbnail((max_size, max_size))
+
+        if original.mode != 'RGB':
+            original = original.convert('RGB')
+
+        output = io.BytesIO()
+        original.save(
+            output,
+            format=FORMATS[ext],
+            quality=settings.RECIPE_IMAGE_QUALITY,
+        )
+
+    saved = storage.save(name, ContentFile(output.getvalue()))
+
+    # A concurrent request may have generated the same derivative first.
+    if saved != name:
+        storage.delete(saved)
+
+    return name
+
+
+def delete_derivatives(image_name):
+    """Delete every derivative generated for image_name."""
+    for size in settings.RECIPE_IMAGE_DERIVATIVES:
+        for ext in FORMATS:
+            default_storage.delete(derivative_name(image_name, size, ext))
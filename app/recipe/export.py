@@ -0,0 +1,92 @@
+"""
+Streaming export of recipes as NDJSON or CSV.
+"""
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from core.models import Recipe
+
+FIELDS = ['id', 'title', 'description', 'time_minutes', 'price', 'link']
+RELATED_FIELDS = ['tags', 'ingredients']
+
+
+class Echo:
+    """File-like object returning what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _related_names(field, recipe_ids):
+    """Return the related names of field for each recipe id."""
+    relation = getattr(Recipe, field)
+    source = relation.field.m2m_field_name()
+    target = relation.field.m2m_reverse_field_name()
+
+    names = defaultdict(list)
+    for recipe_id, name in relation.through.objects.filter(
+        **{f'{source}_id__in': recipe_ids}
+    ).order_by(
+        f'{target}__name'
+    ).values_list(f'{source}_id', f'{target}__name'):
+        names[recipe_id].append(name)
+
+    return names
+
+
+def iter_recipes(queryset, chunk_size):
+    """Yield recipe rows as dicts, fetching relations one chunk at a time.
+
+    The recipes are read through a server-side cursor and their tags and
+    ingredients are looked up per chunk, so memory use stays flat however
+    many recipes are exported.
+    """
+    rows = queryset.prefetch_related(None).values(*FIELDS).iterator(
+        chunk_size=chunk_size
+    )
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        recipe_ids = [row['id'] for row in chunk]
+        related = {
+            field: _related_names(field, recipe_ids)
+            for field in RELATED_FIELDS
+        }
+
+        for row in chunk:
+            for field in RELATED_FIELDS:
+                row[field] = related[field][row['id']]
+            yield row
+
+
+def ndjson_lines(rows):
+    """Yield rows as JSON Lines in the bulk import format."""
+    for row in rows:
+        row['price'] = str(row['price'])
+        for field in RELATED_FIELDS:
+            row[field] = [{'name': name} for name in row[field]]
+        yield json.dumps(row) + '\n'
+
+
+def csv_lines(rows):
+    """Yield rows as CSV, joining related names with semicolons."""
+    writer = csv.writer(Echo())
+
+    yield writer.writerow(FIELDS + RELATED_FIELDS)
+
+    for row in rows:
+        yield writer.writerow(
+            [row[field] for field in FIELDS] +
+            [';'.join(row[field]) for field in RELATED_FIELDS]
+        )
+
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
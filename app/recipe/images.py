@@ -0,0 +1,251 @@
+"""
+Background processing of uploaded recipe images.
+
+Uploads are written to a staging area and acknowledged straight away. A
+small pool of worker threads in each process then downscales and
+re-encodes them with Pillow and swaps the result onto the recipe.
+
+Processed images are stored once per distinct content. Each stored file
+has an ImageBlob counting the recipes using it, and the file is deleted
+once that count drops to zero.
+"""
+import io
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import ImageBlob, Recipe
+from recipe.cache import bump_version
+from recipe.derivatives import delete_derivatives
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def staging_storage():
+    """Return the storage holding uploads waiting to be processed."""
+    return FileSystemStorage(location=settings.RECIPE_IMAGE_STAGING_ROOT)
+
+
+def _get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-image',
+            )
+
+    return _executor
+
+
+def drain():
+    """Wait for the images queued in this process to be processed.
+
+    Set as the uWSGI atexit hook in app/wsgi.py, so workers recycled by
+    max-requests, reload-on-rss or the cheaper subsystem finish their queue
+    before exiting. What is still queued when uWSGI runs out of patience is
+    picked up by the process_images command.
+    """
+    with _executor_lock:
+        executor = _executor
+
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def stage_image(recipe, uploaded):
+    """Save an uploaded image for processing and mark the recipe pending."""
+    ext = os.path.splitext(uploaded.name)[1]
+    staged = staging_storage().save(f'{uuid.uuid4()}{ext}', uploaded)
+
+    recipe.image_status = Recipe.ImageStatus.PENDING
+    recipe.image_staged = staged
+    recipe.save(update_fields=['image_status', 'image_staged', 'updated_at'])
+
+    transaction.on_commit(lambda: submit(recipe.pk, staged))
+
+
+def submit(recipe_id, staged):
+    """Queue a staged image, or process it now if there are no workers."""
+    if settings.RECIPE_IMAGE_WORKERS > 0:
+        _get_executor().submit(_process_in_worker, recipe_id, staged)
+    else:
+        process_image(recipe_id, staged)
+
+
+def _process_in_worker(recipe_id, staged):
+    try:
+        process_image(recipe_id, staged)
+    except Exception:
+        logger.exception(
+            'Processing image %s for recipe %s failed', staged, recipe_id
+        )
+        fail_image(recipe_id, staged)
+    finally:
+        # Worker threads get their own connections, which Django's request
+        # cycle never closes.
+        connections.close_all()
+
+
+def _encode(staged_file):
+    """Return the staged image downscaled and re-encoded as JPEG."""
+    max_size = settings.RECIPE_IMAGE_MAX_SIZE
+
+    with Image.open(staged_file) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_size, max_size))
+
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        output = io.BytesIO()
+        image.save(
+            output,
+            format='JPEG',
+            quality=settings.RECIPE_IMAGE_QUALITY,
+            optimize=True,
+        )
+
+    return output.getvalue()
+
+
+def image_storage():
+    """Return the storage holding processed recipe images."""
+    return Recipe._meta.get_field('image').storage
+
+
+def acquire_image(name):
+    """Take a reference to the stored image name."""
+    while not ImageBlob.objects.filter(name=name).update(
+        refcount=F('refcount') + 1
+    ):
+        # The blob is new, or was collected since the update was tried.
+        ImageBlob.objects.get_or_create(name=name)
+
+
+def release_image(name):
+    """Drop a reference to name, deleting it after commit if unused."""
+    ImageBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1
+    )
+
+    transaction.on_commit(lambda: collect_image(name))
+
+
+def collect_image(name):
+    """Delete the stored image name and its derivatives if unreferenced.
+
+    The blob row stays locked while the files are deleted, so a concurrent
+    acquire_image waits and then stores the content again.
+    """
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(
+            name=name,
+            refcount=0,
+        ).first()
+
+        if blob is None:
+            return False
+
+        image_storage().delete(name)
+        delete_derivatives(name)
+        blob.delete()
+
+    return True
+
+
+def store_image(recipe, content):
+    """Store encoded image bytes once and return the referenced name."""
+    field = Recipe._meta.get_field('image')
+    content = ContentFile(content)
+    upload_name = field.generate_filename(recipe, 'image.jpg')
+    name = field.storage.content_name(upload_name, content)
+
+    # Referenced before saving, so a concurrent collect of the same content
+    # cannot delete the file after it has been found to exist.
+    acquire_image(name)
+
+    return field.storage.save(upload_name, content)
+
+
+def release_recipe_image(sender, instance, **kwargs):
+    """Release the image of a deleted recipe."""
+    if instance.image:
+        release_image(instance.image.name)
+
+
+def _finish(recipe_id, staged, **fields):
+    """Update the recipe if staged is still its latest upload."""
+    return Recipe.objects.filter(
+        pk=recipe_id,
+        image_staged=staged,
+    ).update(image_staged='', updated_at=timezone.now(), **fields)
+
+
+def fail_image(recipe_id, staged):
+    """Mark the recipe's image failed if staged is still its latest upload.
+
+    Used when processing raised, so the recipe is not left pending.
+    """
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).first()
+        if recipe and _finish(
+            recipe_id, staged, image_status=Recipe.ImageStatus.FAILED
+        ):
+            staging_storage().delete(staged)
+            bump_version(recipe.user_id)
+    except Exception:
+        logger.exception('Could not mark image %s failed', staged)
+
+
+def process_image(recipe_id, staged):
+    """Process a staged image and make it the recipe's image.
+
+    If the recipe was deleted or got a newer upload in the meantime, the
+    staged image is dropped.
+    """
+    storage = staging_storage()
+    recipe = Recipe.objects.filter(pk=recipe_id, image_staged=staged).first()
+
+    if recipe is None:
+        storage.delete(staged)
+        return
+
+    try:
+        with storage.open(staged) as staged_file:
+            content = _encode(staged_file)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning('Could not decode image %s', staged, exc_info=True)
+        _finish(recipe_id, staged, image_status=Recipe.ImageStatus.FAILED)
+    else:
+        old_image = recipe.image.name
+        image = store_image(recipe, content)
+
+        if _finish(
+            recipe_id,
+            staged,
+            image=image,
+            image_status=Recipe.ImageStatus.READY,
+        ):
+            if old_image:
+                release_image(old_image)
+        else:
+            release_image(image)
+
+    storage.delete(staged)
+    bump_version(recipe.user_id)
@@ -0,0 +1,80 @@
+"""
+DJANGO Command to delete recipe images no recipe uses.
+"""
+import posixpath
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from core.models import ImageBlob, Recipe
+from recipe.derivatives import delete_derivatives
+from recipe.images import collect_image, image_storage
+
+
+def walk(storage, directory):
+    """Yield the name of every file below directory in storage."""
+    if not storage.exists(directory):
+        return
+
+    directories, files = storage.listdir(directory)
+
+    for name in files:
+        yield posixpath.join(directory, name)
+
+    for name in directories:
+        yield from walk(storage, posixpath.join(directory, name))
+
+
+class Command(BaseCommand):
+    """
+    DJANGO COMMAND TO GARBAGE COLLECT RECIPE IMAGES
+
+    Images are normally deleted as soon as their last recipe lets go of
+    them; this catches the ones missed because a process died in between,
+    and files saved without a reference.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=3600,
+            help='Keep unreferenced files modified in the last GRACE seconds.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+
+        count = 0
+        for name in ImageBlob.objects.filter(
+            refcount=0
+        ).values_list('name', flat=True).iterator():
+            count += collect_image(name)
+
+        storage = image_storage()
+        upload_dir = posixpath.dirname(
+            Recipe._meta.get_field('image').generate_filename(None, 'image')
+        )
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+
+        referenced = set(
+            ImageBlob.objects.values_list('name', flat=True).iterator()
+        )
+        referenced.update(
+            Recipe.objects.exclude(
+                image=''
+            ).exclude(
+                image__isnull=True
+            ).values_list('image', flat=True).iterator()
+        )
+
+        for name in walk(storage, upload_dir):
+            if name in referenced or storage.get_modified_time(name) > cutoff:
+                continue
+
+            storage.delete(name)
+            delete_derivatives(name)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} images'))
@@ -0,0 +1,51 @@
+"""
+DJANGO Command to process recipe images left pending.
+"""
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe.images import fail_image, process_image
+
+
+class Command(BaseCommand):
+    """
+    DJANGO COMMAND TO PROCESS PENDING RECIPE IMAGES
+
+    Uploads queued in a worker that restarted before processing them stay
+    pending; this processes them in the foreground. run.sh runs it when
+    the app starts. Uploads staged in the last GRACE seconds are left to
+    the workers that may still have them queued.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=300,
+            help='Skip uploads staged in the last GRACE seconds.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        pending = Recipe.objects.filter(
+            image_status=Recipe.ImageStatus.PENDING,
+            updated_at__lt=cutoff,
+        ).exclude(
+            image_staged=''
+        ).values_list('id', 'image_staged')
+
+        count = 0
+        for recipe_id, staged in pending.iterator():
+            try:
+                process_image(recipe_id, staged)
+            except Exception as exc:
+                self.stderr.write(f'Processing image {staged} failed: {exc}')
+                fail_image(recipe_id, staged)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {count} images'))
@@ -0,0 +1,77 @@
+"""
+Pagination for the recipe APIs.
+"""
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination seeking on the recipe id.
+
+    Each page filters on ``id < <last id>`` instead of using an OFFSET,
+    so any page costs the same as the first one.
+    """
+
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class RecipeSearchPagination(LimitOffsetPagination):
+    """Offset pagination for search results.
+
+    Search results are ordered by relevance rank and then id. The rank is
+    computed for every matching recipe on each request, so there is no
+    index to seek on, and skipping rows with an OFFSET costs little more
+    than the ranking itself. The id keeps the order of recipes with the
+    same rank stable from page to page.
+
+    Pages have the same next, previous and results as the cursor pages,
+    and as there, no COUNT query is run: one more row than the page size
+    is fetched to know whether there is a next page.
+    """
+
+    default_limit = RecipeCursorPagination.page_size
+    limit_query_param = 'page_size'
+    max_limit = RecipeCursorPagination.max_page_size
+    template = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = self.get_offset(request)
+
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+
+        return results[:self.limit]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+
+        return replace_query_param(
+            url,
+            self.offset_query_param,
+            self.offset + self.limit
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        del response_schema['properties']['count']
+
+        return response_schema
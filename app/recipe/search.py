@@ -0,0 +1,86 @@
+"""
+Full-text search over recipes and autocompletion of tag and ingredient
+names.
+
+Each recipe stores a tsvector of its title, ingredient names and
+description, weighted in that order. It is recomputed in the database
+whenever one of those changes, and searched through a GIN index.
+
+Names are completed from a pg_trgm GIN index on ``UPPER(name)``, which
+serves both the prefix and the similarity match.
+"""
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db.models import (
+    BooleanField,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+)
+from django.db.models.functions import Upper
+
+
+def search_vector(recipe_model):
+    """Return an expression computing the search vector of a recipe."""
+    config = settings.RECIPE_SEARCH_CONFIG
+
+    ingredient_names = recipe_model.ingredients.through.objects.filter(
+        recipe_id=OuterRef('pk')
+    ).order_by().values('recipe_id').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+
+    return (
+        SearchVector('title', weight='A', config=config) +
+        SearchVector(Subquery(ingredient_names), weight='B', config=config) +
+        SearchVector('description', weight='C', config=config)
+    )
+
+
+def update_search_vectors(queryset):
+    """Recompute the search vector of every recipe in queryset."""
+    queryset.update(search_vector=search_vector(queryset.model))
+
+
+def search_recipes(queryset, text):
+    """Filter queryset to recipes matching text, ranked by relevance.
+
+    The text is parsed like a web search engine query, so quoted phrases,
+    ``or`` and ``-word`` work as users expect.
+    """
+    query = SearchQuery(
+        text,
+        search_type='websearch',
+        config=settings.RECIPE_SEARCH_CONFIG,
+    )
+
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    )
+
+
+def autocomplete_names(queryset, text, limit):
+    """Return up to limit objects of queryset whose name completes text.
+
+    Names starting with text come first, followed by names that are only
+    similar to it so typos still match, each ordered by similarity.
+    """
+    text = text.upper()
+    prefix = Q(upper_name__startswith=text)
+
+    return queryset.annotate(
+        upper_name=Upper('name'),
+    ).filter(
+        prefix | Q(upper_name__trigram_similar=text)
+    ).annotate(
+        is_prefix=ExpressionWrapper(prefix, output_field=BooleanField()),
+        similarity=TrigramSimilarity('upper_name', text),
+    ).order_by('-is_prefix', '-similarity', 'name')[:limit]
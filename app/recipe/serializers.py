@@ -1,11 +1,95 @@
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils.translation import gettext as _
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from recipe.cache import bump_version
+from recipe.counts import adjust_recipe_counts, count_new_links
+from recipe.search import update_search_vectors
+
 from core.models import (
     Recipe,
     Tag,
     Ingredient
 )
 
+# Recipe fields that feed the full-text search vector, see recipe/search.py
+SEARCH_FIELDS = {'title', 'description'}
+
+
+def validate_unique_name(serializer, name):
+    """Reject renaming a tag or ingredient to a name the user already has."""
+    instance = serializer.instance
+
+    if instance is not None and type(instance).objects.filter(
+        user_id=instance.user_id,
+        name=name
+    ).exclude(pk=instance.pk).exists():
+        msg = _('An item with this name already exists.')
+        raise serializers.ValidationError(msg, code='unique')
+
+    return name
+
+
+def get_or_create_by_name(model, user, names):
+    """Return a name to object mapping, bulk creating any missing names.
+
+    Missing names are inserted with ON CONFLICT DO NOTHING against the
+    (user, name) unique constraint and then read back, so a concurrent
+    request creating the same name ends up sharing the same row.
+    """
+    if not names:
+        return {}
+
+    objs = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+
+    missing = [name for name in names if name not in objs]
+    if missing:
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True
+        )
+        objs.update(
+            (obj.name, obj)
+            for obj in model.objects.filter(user=user, name__in=missing)
+        )
+        transaction.on_commit(lambda: bump_version(user.pk))
+
+    return objs
+
+
+def add_related(field, links):
+    """Insert (recipe, obj) links for a recipe M2M field in one query.
+
+    The links must not exist yet, as each one is added to the recipe count
+    of its object.
+    """
+    relation = getattr(Recipe, field)
+    through = relation.through
+    source = relation.field.m2m_field_name()
+    target = relation.field.m2m_reverse_field_name()
+
+    links = list({
+        (recipe.pk, obj.pk): (recipe, obj) for recipe, obj in links
+    }.values())
+    if links:
+        through.objects.bulk_create(
+            [
+                through(**{source: recipe, target: obj})
+                for recipe, obj in links
+            ],
+            ignore_conflicts=True
+        )
+        count_new_links(
+            relation.field.related_model,
+            [obj for _, obj in links]
+        )
+
 class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -13,6 +97,9 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name')
         read_only_fields = ['id']
 
+    def validate_name(self, value):
+        return validate_unique_name(self, value)
+
 class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -20,36 +107,113 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
         read_only_fields = ['id']
 
+    def validate_name(self, value):
+        return validate_unique_name(self, value)
+
+
+class IngredientDetailSerializer(IngredientSerializer):
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ('recipe_count',)
+        read_only_fields = IngredientSerializer.Meta.read_only_fields + [
+            'recipe_count'
+        ]
+
+
+class TagDetailSerializer(TagSerializer):
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = TagSerializer.Meta.read_only_fields + [
+            'recipe_count'
+        ]
+
 class RecipeSerializer(serializers.ModelSerializer):
 
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
+    image_urls = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients']
+        fields = [
+            'id', 'title', 'time_minutes', 'price', 'link', 'tags',
+            'ingredients', 'image_urls',
+        ]
         read_only_fields = ['id']
 
-    def _get_or_create_tags(self, tags, recipe):
-        auth_user = self.context['request'].user
+    @extend_schema_field(serializers.DictField(
+        child=serializers.URLField(),
+        allow_null=True
+    ))
+    def get_image_urls(self, recipe):
+        """Return the URL of each image derivative size."""
+        if not recipe.image:
+            return None
 
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag
-            )
-            recipe.tags.add(tag_obj)
+        request = self.context.get('request')
+        urls = {}
 
-    def _get_or_create_ingredients(self, ingredients, recipe):
-        auth_user = self.context['request'].user
+        for size in settings.RECIPE_IMAGE_DERIVATIVES:
+            url = reverse('recipe:recipe-image', args=[recipe.id, size])
+            urls[size] = request.build_absolute_uri(url) if request else url
+
+        return urls
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Prefetch the relations rendered by this serializer."""
+        return queryset.prefetch_related('tags', 'ingredients')
+
+    def _get_or_create_objects(self, model, items):
+        """Return objects for items, bulk creating any missing names."""
+        names = list(dict.fromkeys(item['name'] for item in items))
+        objs = get_or_create_by_name(
+            model,
+            self.context['request'].user,
+            names
+        )
+
+        return [objs[name] for name in names]
+
+    def _add_related(self, recipe, field, objs):
+        """Link objs to recipe with a single insert into the through table."""
+        add_related(field, [(recipe, obj) for obj in objs])
+
+    def _set_related(self, recipe, field, objs):
+        """Make objs the recipe's relation, touching only changed links."""
+        relation = getattr(Recipe, field)
+        through = relation.through
+        source = relation.field.m2m_field_name()
+        target = relation.field.m2m_reverse_field_name()
+
+        links = through.objects.filter(**{source: recipe})
+        current = set(links.values_list(f'{target}_id', flat=True))
+        wanted = {obj.pk for obj in objs}
 
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient
+        removed = current - wanted
+        if removed:
+            links.filter(**{f'{target}_id__in': removed}).delete()
+            adjust_recipe_counts(
+                relation.field.related_model,
+                dict.fromkeys(removed, -1)
             )
-            recipe.ingredients.add(ingredient_obj)
 
+        self._add_related(
+            recipe,
+            field,
+            [obj for obj in objs if obj.pk not in current]
+        )
+
+    def _get_or_create_tags(self, tags, recipe):
+        tag_objs = self._get_or_create_objects(Tag, tags)
+        self._add_related(recipe, 'tags', tag_objs)
+
+    def _get_or_create_ingredients(self, ingredients, recipe):
+        ingredient_objs = self._get_or_create_objects(Ingredient, ingredients)
+        self._add_related(recipe, 'ingredients', ingredient_objs)
+
+    @transaction.atomic
     def create(self, validated_data):
 
         tags = validated_data.pop('tags', [])
@@ -57,38 +221,65 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         self._get_or_create_tags(tags, recipe)
         self._get_or_create_ingredients(ingredients, recipe)
+        update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
 
         tags = validated_data.pop('tags', None)
 
         ingredients = validated_data.pop('ingredients', None)
 
+        if tags is not None or ingredients is not None:
+            # Lock the recipe so concurrent edits cannot both add the same
+            # link and count it twice.
+            Recipe.objects.select_for_update().filter(pk=instance.pk).exists()
+
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            self._set_related(
+                instance,
+                'tags',
+                self._get_or_create_objects(Tag, tags)
+            )
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            self._set_related(
+                instance,
+                'ingredients',
+                self._get_or_create_objects(Ingredient, ingredients)
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
         instance.save()
 
+        if ingredients is not None or validated_data.keys() & SEARCH_FIELDS:
+            update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+
         return instance
 
 class RecipeDetailSerializer(RecipeSerializer):
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description',
+            'image',
+            'image_status'
+        ]
+        # Images are only set through upload-image, which counts their
+        # references
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + [
+            'image',
+            'image_status'
+        ]
+
 
 class RecipeImageSerializer(serializers.ModelSerializer):
 
     class Meta():
         model = Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
+        fields = ['id', 'image', 'image_status']
+        read_only_fields = ['id', 'image_status']
         extra_kwargs = {'image': {'required': 'True'}}
\ No newline at end of file
@@ -0,0 +1,164 @@
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from decimal import Decimal
+
+from core.models import (
+    Recipe,
+    Tag,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def create_recipe(user, **kwargs):
+
+    defaults = {
+        "title": "Sample recipe title",
+        "time_minutes": 5,
+        "price": Decimal("5.05"),
+    }
+
+    defaults.update(kwargs)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def create_user(email='test@example.com', password='password@testuser'):
+
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def result_ids(res):
+
+    return [recipe['id'] for recipe in res.data['results']]
+
+
+class ResponseCacheTests(TestCase):
+    """Test the per-user list response cache"""
+
+    def setUp(self):
+
+        cache.clear()
+
+        self.user = create_user()
+
+        self.client = APIClient()
+
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list request does not hit the database"""
+
+        recipe = create_recipe(user=self.user)
+
+        self.client.get(RECIPE_URL)
+
+        create_recipe(user=self.user, title='Added behind the API')
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(result_ids(res), [recipe.id])
+
+    def test_cache_keyed_on_query_params(self):
+        """Test different filters are cached separately"""
+
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        r1.tags.add(tag)
+
+        self.client.get(RECIPE_URL)
+
+        res = self.client.get(RECIPE_URL, {'tags': tag.id})
+
+        self.assertEqual(result_ids(res), [r1.id])
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(result_ids(res), [r2.id, r1.id])
+
+    def test_cache_limited_to_user(self):
+        """Test users never see another user's cached list"""
+
+        create_recipe(user=self.user)
+
+        self.client.get(RECIPE_URL)
+
+        other_user = create_user(email='other@example.com')
+        other_client = APIClient()
+        other_client.force_authenticate(other_user)
+
+        res = other_client.get(RECIPE_URL)
+
+        self.assertEqual(result_ids(res), [])
+
+    def test_create_invalidates_cache(self):
+        """Test creating a recipe invalidates the recipe and tag lists"""
+
+        self.client.get(RECIPE_URL)
+        self.client.get(TAGS_URL)
+
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': Decimal('5.50'),
+            'tags': [{'name': 'Dinner'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data['results']],
+            ['Curry']
+        )
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual([tag['name'] for tag in res.data], ['Dinner'])
+
+    def test_update_invalidates_cache(self):
+        """Test updating a recipe invalidates the recipe list"""
+
+        recipe = create_recipe(user=self.user)
+
+        self.client.get(RECIPE_URL)
+
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        self.client.patch(url, {'title': 'New title'})
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data['results'][0]['title'], 'New title')
+
+    def test_destroy_tag_invalidates_recipe_cache(self):
+        """Test deleting a tag removes it from the cached recipe list"""
+
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+
+        self.client.get(RECIPE_URL)
+
+        url = reverse('recipe:tag-detail', args=[tag.id])
+        res = self.client.delete(url)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data['results'][0]['tags'], [])
@@ -6,11 +6,12 @@ from core.models import (
     Ingredient,
     Recipe
 )
-from recipe.serializers import IngredientSerializer
+from recipe.serializers import IngredientDetailSerializer
 from django.urls import reverse
 from decimal import Decimal
 
 INGREDIENT_URL = reverse('recipe:ingredient-list')
+AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
 
 def get_detail_url(id):
 
@@ -59,7 +60,7 @@ class PrivateIngredientApiTestCase(TestCase):
 
         ingredient = Ingredient.objects.all().order_by('-name')
 
-        serializer = IngredientSerializer(ingredient, many=True)
+        serializer = IngredientDetailSerializer(ingredient, many=True)
 
         self.assertEqual(res.data, serializer.data)
 
@@ -76,7 +77,7 @@ class PrivateIngredientApiTestCase(TestCase):
 
         ingredient = Ingredient.objects.filter(user=self.user).order_by('-name')
 
-        serializer = IngredientSerializer(ingredient, many=True)
+        serializer = IngredientDetailSerializer(ingredient, many=True)
 
         self.assertEqual(res.data, serializer.data)
 
@@ -96,6 +97,19 @@ class PrivateIngredientApiTestCase(TestCase):
 
         self.assertEqual(ingredient.name, payload['name'])
 
+    def test_update_ingredient_duplicate_name_error(self):
+
+        create_ingredient(user=self.user, name="Banana")
+
+        ingredient = create_ingredient(user=self.user, name="Rose Water")
+
+        res = self.client.patch(
+            get_detail_url(ingredient.id),
+            {'name': 'Banana'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_delete_ingredient(self):
 
         ingredient = create_ingredient(user=self.user, name="Rose Water")
@@ -122,13 +136,14 @@ class PrivateIngredientApiTestCase(TestCase):
         )
 
         recipe.ingredients.add(in1)
+        in1.refresh_from_db()
 
         res = self.client.get(INGREDIENT_URL, {"assigned_only": 1})
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        s1 = IngredientSerializer(in1)
-        s2 = IngredientSerializer(in2)
+        s1 = IngredientDetailSerializer(in1)
+        s2 = IngredientDetailSerializer(in2)
 
         self.assertIn(s1.data, res.data)
         self.assertNotIn(s2.data, res.data)
@@ -160,4 +175,62 @@ class PrivateIngredientApiTestCase(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        self.assertEqual(len(res.data), 1)
\ No newline at end of file
+        self.assertEqual(len(res.data), 1)
+
+    def test_autocomplete_ingredients(self):
+        """Test names starting with the text come before similar names"""
+
+        names = ['Garlic powder', 'Garlic', 'Ginger', 'Cigar leaf', 'Salt']
+        for name in names:
+            create_ingredient(user=self.user, name=name)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'garl'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [ingredient['name'] for ingredient in res.data],
+            ['Garlic', 'Garlic powder']
+        )
+
+    def test_autocomplete_tolerates_typos(self):
+
+        garlic = create_ingredient(user=self.user, name='Garlic')
+        create_ingredient(user=self.user, name='Salt')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'garlc'})
+
+        self.assertEqual(
+            [ingredient['id'] for ingredient in res.data],
+            [garlic.id]
+        )
+
+    def test_autocomplete_limit(self):
+
+        for i in range(5):
+            create_ingredient(user=self.user, name=f'Pepper {i}')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'pep', 'limit': 2})
+
+        self.assertEqual(len(res.data), 2)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'pep', 'limit': 'all'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_autocomplete_limited_to_user(self):
+
+        other_user = create_user(email='other@example.com')
+        create_ingredient(user=other_user, name='Garlic')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'garlic'})
+
+        self.assertEqual(res.data, [])
+
+    def test_autocomplete_empty_text(self):
+
+        create_ingredient(user=self.user, name='Garlic')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': ' '})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
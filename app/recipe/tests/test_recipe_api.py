@@ -1,20 +1,43 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
+import io
 import tempfile
 import os
+import threading
 from PIL import Image
 
 from core.models import (
+    ImageBlob,
     Recipe,
     Tag,
     Ingredient
 )
+from recipe import images
+from recipe.images import (
+    _process_in_worker,
+    drain,
+    process_image,
+    staging_storage,
+    submit,
+)
+from recipe.derivatives import (
+    delete_derivatives,
+    derivative_name,
+    webp_supported
+)
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer
@@ -31,6 +54,13 @@ def image_upload_url(recipe_id):
 
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
+
+def image_url(recipe_id, size):
+    """Create and return an image derivative URL"""
+
+    return reverse('recipe:recipe-image', args=[recipe_id, size])
+
+
 def create_recipe(user, **kwargs):
 
     defaults = {
@@ -51,6 +81,22 @@ def create_user(**kwargs):
 
     return get_user_model().objects.create_user(**kwargs)
 
+
+def assert_query_budget(test_case, budget, url, params=None):
+    """GET url and assert it runs no more than budget queries."""
+
+    with CaptureQueriesContext(connection) as queries:
+        res = test_case.client.get(url, params)
+
+    test_case.assertEqual(res.status_code, status.HTTP_200_OK)
+    test_case.assertLessEqual(
+        len(queries),
+        budget,
+        '\n'.join(query['sql'] for query in queries.captured_queries)
+    )
+
+    return res
+
 class PublicRecipeAPITests(TestCase):
     """Test unauthenticated API request """
 
@@ -88,7 +134,7 @@ class PrivateRecipieAPITests(TestCase):
         serializer = RecipeSerializer(recipe, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrive_recipe_limited_to_user(self):
 
@@ -102,7 +148,7 @@ class PrivateRecipieAPITests(TestCase):
         recipe = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipe, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_retrive_detail_recipe(self):
 
@@ -456,6 +502,39 @@ class PrivateRecipieAPITests(TestCase):
 
             self.assertTrue(exists)
 
+    def test_create_recipe_with_many_ingredients_in_bulk(self):
+        """Test nested ingredients are created in a fixed number of queries"""
+
+        Ingredient.objects.create(user=self.user, name='ingredient 0')
+
+        payload = {
+            'title': 'Thirty ingredient curry',
+            'price': Decimal(12),
+            'time_minutes': 30,
+            'ingredients': [
+                {'name': f'ingredient {i}'} for i in range(30)
+            ] + [{'name': 'ingredient 1'}]
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        # Recipe insert, ingredient lookup, insert and read back, link
+        # insert, recipe count and search vector updates, savepoint release
+        # and the two relation reads for the response.
+        self.assertLessEqual(len(queries), 11)
+
+        recipe = Recipe.objects.get(id=res.data['id'])
+
+        self.assertEqual(recipe.ingredients.count(), 30)
+
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(),
+            30
+        )
+
     def test_create_ingredient_on_update(self):
 
         recipe = create_recipe(user=self.user)
@@ -494,6 +573,61 @@ class PrivateRecipieAPITests(TestCase):
 
         self.assertNotIn(ingredient_1, recipe.ingredients.all())
 
+    def test_update_one_ingredient_keeps_other_links(self):
+        """Test a PATCH only rewrites the links that changed"""
+
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'ingredient {i}')
+            for i in range(20)
+        ]
+
+        recipe = create_recipe(user=self.user)
+
+        recipe.ingredients.add(*ingredients)
+
+        through = Recipe.ingredients.through
+
+        kept_links = set(
+            through.objects.filter(
+                recipe=recipe
+            ).exclude(
+                ingredient=ingredients[0]
+            ).values_list('id', flat=True)
+        )
+
+        payload = {
+            'ingredients': [{'name': 'replacement'}] + [
+                {'name': ingredient.name} for ingredient in ingredients[1:]
+            ]
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(
+                get_details_url(recipe.id),
+                payload,
+                format='json'
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        writes = [
+            query['sql'] for query in queries.captured_queries
+            if through._meta.db_table in query['sql']
+            and query['sql'].startswith(('INSERT', 'DELETE'))
+        ]
+
+        self.assertEqual(len(writes), 2)
+
+        links = through.objects.filter(recipe=recipe)
+
+        self.assertEqual(links.count(), 20)
+
+        self.assertTrue(
+            kept_links.issubset(set(links.values_list('id', flat=True)))
+        )
+
+        self.assertNotIn(ingredients[0], recipe.ingredients.all())
+
     def test_clear_ingredients(self):
 
         ingredient_1 = Ingredient.objects.create(user=self.user, name='mango')
@@ -539,11 +673,11 @@ class PrivateRecipieAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        self.assertIn(s1.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
 
-        self.assertIn(s2.data, res.data)
+        self.assertIn(s2.data, res.data['results'])
 
-        self.assertNotIn(s3.data, res.data)
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredient(self):
         """Test filtering by tags"""
@@ -572,12 +706,365 @@ class PrivateRecipieAPITests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        self.assertIn(s1.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+
+        self.assertIn(s2.data, res.data['results'])
+
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_by_tags_and_ingredients(self):
+        """Test recipes with several matching tags are returned once"""
+
+        r1 = create_recipe(user=self.user, title="Butter Chicken")
+
+        r2 = create_recipe(user=self.user, title="Chicken Sanwitch")
+
+        tag1 = Tag.objects.create(user=self.user, name="Indian")
+
+        tag2 = Tag.objects.create(user=self.user, name="Dinner")
+
+        in1 = Ingredient.objects.create(user=self.user, name="Butter")
+
+        r1.tags.add(tag1, tag2)
+
+        r1.ingredients.add(in1)
+
+        r2.tags.add(tag1)
+
+        filter = {'tags': f'{tag1.id},{tag2.id}', 'ingredients': f'{in1.id}'}
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPE_URL, filter)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [r1.id]
+        )
+
+        for query in queries.captured_queries:
+            self.assertNotIn('DISTINCT', query['sql'])
+
+    def test_filter_match_all_tags(self):
+        """Test match=all only returns recipes having every tag"""
+
+        r1 = create_recipe(user=self.user, title="Butter Chicken")
+
+        r2 = create_recipe(user=self.user, title="Chicken Sanwitch")
+
+        tag1 = Tag.objects.create(user=self.user, name="Indian")
+
+        tag2 = Tag.objects.create(user=self.user, name="Dinner")
+
+        r1.tags.add(tag1, tag2)
+
+        r2.tags.add(tag1)
+
+        filter = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+
+        res = self.client.get(RECIPE_URL, filter)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [r1.id]
+        )
+
+    def test_filter_match_all_ingredients(self):
+        """Test match=all applies to ingredients and ignores repeats"""
+
+        r1 = create_recipe(user=self.user, title="Butter Chicken")
+
+        r2 = create_recipe(user=self.user, title="Chicken Sanwitch")
+
+        in1 = Ingredient.objects.create(user=self.user, name="Butter")
+
+        in2 = Ingredient.objects.create(user=self.user, name="Bread")
+
+        r1.ingredients.add(in1, in2)
+
+        r2.ingredients.add(in2)
+
+        filter = {
+            'ingredients': f'{in1.id},{in2.id},{in1.id}',
+            'match': 'all'
+        }
+
+        res = self.client.get(RECIPE_URL, filter)
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [r1.id]
+        )
+
+
+class RecipePaginationTests(TestCase):
+    """Test cursor pagination of the recipe list"""
+
+    def setUp(self):
+
+        self.user = create_user(
+            email='test@example.com',
+            password='password@testuser'
+        )
+
+        self.client = APIClient()
+
+        self.client.force_authenticate(self.user)
+
+    def test_paginate_recipes(self):
+        """Test walking every page returns each recipe once in order"""
+
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_paginate_filtered_recipes(self):
+        """Test pagination applies on top of the tag filter"""
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        tagged = []
+        for i in range(3):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(tag)
+            tagged.append(recipe)
+            create_recipe(user=self.user, title=f'Untagged {i}')
+
+        res = self.client.get(RECIPE_URL, {'tags': tag.id, 'page_size': 2})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIn('tags=', res.data['next'])
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(res.data['results'][0]['id'], tagged[0].id)
+
+
+class RecipeQueryBudgetTests(TestCase):
+    """Test the recipe endpoints run a fixed number of queries"""
+
+    def setUp(self):
+
+        self.user = create_user(
+            email='test@example.com',
+            password='password@testuser'
+        )
+
+        self.client = APIClient()
+
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+
+        recipes = []
+
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {i}'),
+                Tag.objects.create(user=self.user, name=f'Other tag {i}'),
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Salt {i}'),
+                Ingredient.objects.create(user=self.user, name=f'Rice {i}'),
+            )
+            recipes.append(recipe)
+
+        return recipes
+
+    def test_list_query_budget(self):
+        """Test listing recipes does not query once per recipe"""
+
+        recipes = self._create_recipes(10)
+
+        res = assert_query_budget(self, 3, RECIPE_URL)
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [recipe.id for recipe in reversed(recipes)]
+        )
+        for recipe in res.data['results']:
+            self.assertEqual(len(recipe['tags']), 2)
+            self.assertEqual(len(recipe['ingredients']), 2)
+
+    def test_filtered_list_query_budget(self):
+        """Test filtering recipes keeps the same query budget"""
+
+        recipes = self._create_recipes(5)
+        tag_ids = ','.join(
+            str(recipe.tags.first().id) for recipe in recipes
+        )
+
+        res = assert_query_budget(self, 3, RECIPE_URL, {'tags': tag_ids})
+
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_detail_query_budget(self):
+        """Test retrieving a recipe prefetches its relations"""
+
+        recipe = self._create_recipes(1)[0]
+
+        # One query for the ETag version, three for the recipe itself.
+        res = assert_query_budget(self, 4, get_details_url(recipe.id))
+
+        serializer = RecipeDetailSerializer(recipe)
+
+        self.assertEqual(res.data, serializer.data)
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag handling on the recipe endpoints"""
+
+    def setUp(self):
+
+        cache.clear()
+
+        self.user = create_user(
+            email='test@example.com',
+            password='password@testuser'
+        )
+
+        self.client = APIClient()
+
+        self.client.force_authenticate(self.user)
+
+        self.recipe = create_recipe(user=self.user)
+
+    def test_detail_not_modified(self):
+        """Test a matching If-None-Match returns 304 with one query"""
+
+        url = get_details_url(self.recipe.id)
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', res)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(res.content)
+
+    def test_detail_etag_changes_on_update(self):
+        """Test updating a recipe changes its ETag"""
+
+        url = get_details_url(self.recipe.id)
+
+        etag = self.client.get(url)['ETag']
+
+        self.client.patch(url, {'title': 'New title'})
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'New title')
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_detail_etag_changes_on_tag_rename(self):
+        """Test renaming a tag changes the ETag of recipes using it"""
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+
+        url = get_details_url(self.recipe.id)
+
+        etag = self.client.get(url)['ETag']
+
+        self.client.patch(
+            reverse('recipe:tag-detail', args=[tag.id]),
+            {'name': 'Vegetarian'}
+        )
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_detail_other_users_recipe_not_found(self):
+        """Test ETags are never issued for another user's recipe"""
+
+        other_user = create_user(
+            email='other@example.com',
+            password='other@password'
+        )
+        recipe = create_recipe(user=other_user)
+
+        res = self.client.get(
+            get_details_url(recipe.id),
+            HTTP_IF_NONE_MATCH='*'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_not_modified(self):
+        """Test the list returns 304 without querying the database"""
+
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
 
-        self.assertIn(s2.data, res.data)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(queries), 0)
 
-        self.assertNotIn(s3.data, res.data)
+    def test_list_etag_changes_on_create(self):
+        """Test creating a recipe changes the list ETag"""
+
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': Decimal('5.50'),
+        }
+        self.client.post(RECIPE_URL, payload)
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
 
+    def test_list_etag_depends_on_query(self):
+        """Test each filter gets its own ETag"""
+
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        res = self.client.get(
+            RECIPE_URL,
+            {'page_size': 1},
+            HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+@override_settings(
+    RECIPE_IMAGE_WORKERS=0,
+    RECIPE_IMAGE_MAX_SIZE=50,
+    RECIPE_IMAGE_DERIVATIVES={'thumbnail': 20, 'full': 50}
+)
 class ImageUploadTest(TestCase):
 
     def setUp(self):
@@ -590,25 +1077,323 @@ class ImageUploadTest(TestCase):
         self.recipe = create_recipe(self.user)
 
     def tearDown(self):
+        if self.recipe.image:
+            delete_derivatives(self.recipe.image.name)
         self.recipe.image.delete()
 
-    def test_upload_image(self):
+    def upload(self, size=(10, 10)):
 
         url = image_upload_url(self.recipe.id)
 
-        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
-            img = Image.new('RGB', (10,10))
-            img.save(image_file, format='JPEG')
+        with tempfile.NamedTemporaryFile(suffix='.png') as image_file:
+            img = Image.new('RGBA', size)
+            img.save(image_file, format='PNG')
             image_file.seek(0)
             payload = {'image': image_file}
-            res = self.client.post(url, payload, format="multipart")
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(url, payload, format="multipart")
 
         self.recipe.refresh_from_db()
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return res
+
+    def test_upload_image(self):
+
+        res = self.upload()
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], 'pending')
 
+        self.assertEqual(self.recipe.image_status, 'ready')
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(img.format, 'JPEG')
+
+    def test_upload_image_downscaled(self):
+        """Test large images are downscaled keeping their aspect ratio"""
+
+        self.upload(size=(300, 100))
+
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(img.size, (50, 17))
+
+    def test_upload_image_staging_cleaned(self):
+        """Test the staged upload is removed once processed"""
+
+        staging = staging_storage()
+
+        with patch('recipe.images.submit') as patched_submit:
+            self.upload()
+
+        self.recipe.refresh_from_db()
+        staged = self.recipe.image_staged
+
+        self.assertEqual(self.recipe.image_status, 'pending')
+        self.assertTrue(staging.exists(staged))
+
+        process_image(self.recipe.id, staged)
+
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, 'ready')
+        self.assertEqual(self.recipe.image_staged, '')
+        self.assertFalse(staging.exists(staged))
+        patched_submit.assert_called_once_with(self.recipe.id, staged)
+
+    def test_upload_replaces_old_image(self):
+        """Test the previous image file is removed"""
+
+        self.upload()
+        old_path = self.recipe.image.path
+
+        with patch('recipe.images.submit'):
+            self.upload(size=(20, 20))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_image(self.recipe.id, self.recipe.image_staged)
+
+        self.recipe.refresh_from_db()
+
+        self.assertNotEqual(self.recipe.image.path, old_path)
+        self.assertFalse(os.path.exists(old_path))
+
+    def test_same_image_stored_once(self):
+        """Test recipes uploading identical images share one file"""
+
+        self.upload()
+        first = self.recipe
+        self.recipe = create_recipe(self.user)
+        self.upload()
+
+        self.assertEqual(self.recipe.image.name, first.image.name)
+        self.assertEqual(
+            ImageBlob.objects.get(name=first.image.name).refcount,
+            2
+        )
+
+    def test_deleted_recipe_releases_image(self):
+        """Test an image is deleted with the last recipe using it"""
+
+        self.upload()
+        other = create_recipe(self.user)
+        other.image = self.recipe.image.name
+        other.save()
+        ImageBlob.objects.filter(name=other.image.name).update(refcount=2)
+        path = self.recipe.image.path
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(get_details_url(self.recipe.id))
+
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(
+            ImageBlob.objects.filter(name=other.image.name).exists()
+        )
+
+    def test_image_not_set_by_update(self):
+        """Test the detail endpoint leaves the image and its count alone"""
+
+        self.upload()
+        name = self.recipe.image.name
+
+        with tempfile.NamedTemporaryFile(suffix='.png') as image_file:
+            Image.new('RGBA', (20, 20)).save(image_file, format='PNG')
+            image_file.seek(0)
+            res = self.client.patch(
+                get_details_url(self.recipe.id),
+                {'image': image_file, 'title': 'New title'},
+                format='multipart'
+            )
+
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.recipe.title, 'New title')
+        self.assertEqual(self.recipe.image.name, name)
+        self.assertEqual(ImageBlob.objects.get(name=name).refcount, 1)
+        self.assertEqual(ImageBlob.objects.count(), 1)
+
+    def test_collect_images_command(self):
+        """Test the command deletes files no recipe references"""
+
+        self.upload()
+        path = self.recipe.image.path
+        Recipe.objects.filter(id=self.recipe.id).update(image='')
+        ImageBlob.objects.all().delete()
+
+        call_command('collect_images', stdout=io.StringIO())
+
+        self.assertTrue(os.path.exists(path))
+
+        call_command('collect_images', grace=-60, stdout=io.StringIO())
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_superseded_upload_dropped(self):
+        """Test an upload replaced by a newer one is not applied"""
+
+        with patch('recipe.images.submit'):
+            self.upload()
+            first = self.recipe.image_staged
+            self.upload()
+
+        process_image(self.recipe.id, first)
+
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, 'pending')
+        self.assertFalse(staging_storage().exists(first))
+
+        process_image(self.recipe.id, self.recipe.image_staged)
+
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, 'ready')
+
+    def test_process_images_command(self):
+        """Test the command processes uploads left pending"""
+
+        with patch('recipe.images.submit'):
+            self.upload()
+
+        call_command('process_images', stdout=io.StringIO())
+
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, 'pending')
+
+        call_command('process_images', grace=-60, stdout=io.StringIO())
+
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, 'ready')
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+
+    @override_settings(RECIPE_IMAGE_WORKERS=1)
+    def test_drain_waits_for_queued_images(self):
+        """Test draining a worker finishes the images it has queued"""
+
+        started = threading.Event()
+        processed = []
+
+        def process(recipe_id, staged):
+            started.wait(5)
+            processed.append(staged)
+
+        self.addCleanup(setattr, images, '_executor', None)
+
+        with patch('recipe.images.process_image', process), \
+                patch('recipe.images.connections'):
+            submit(self.recipe.id, 'first.jpg')
+            submit(self.recipe.id, 'second.jpg')
+            started.set()
+            drain()
+
+        self.assertEqual(processed, ['first.jpg', 'second.jpg'])
+
+    def test_worker_error_marks_image_failed(self):
+        """Test an unexpected error in a worker does not leave it pending"""
+
+        with patch('recipe.images.submit'):
+            self.upload()
+
+        staged = self.recipe.image_staged
+
+        with patch('recipe.images.store_image', side_effect=RuntimeError), \
+                patch('recipe.images.connections'), \
+                self.assertLogs('recipe.images', 'ERROR'):
+            _process_in_worker(self.recipe.id, staged)
+
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(self.recipe.image_status, 'failed')
+        self.assertEqual(self.recipe.image_staged, '')
+        self.assertFalse(staging_storage().exists(staged))
+
+    def test_image_derivative(self):
+        """Test a resized JPEG is generated and redirected to"""
+
+        self.upload(size=(300, 100))
+
+        res = self.client.get(image_url(self.recipe.id, 'thumbnail'))
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(res['Vary'], 'Accept')
+
+        name = derivative_name(self.recipe.image.name, 'thumbnail', 'jpg')
+
+        self.assertTrue(res['Location'].endswith(name))
+
+        with default_storage.open(name) as derivative:
+            with Image.open(derivative) as img:
+                self.assertEqual(img.format, 'JPEG')
+                self.assertEqual(img.size, (20, 7))
+
+    @skipUnless(webp_supported(), 'Pillow built without WebP support')
+    def test_image_derivative_webp(self):
+        """Test WebP is served to clients accepting it"""
+
+        self.upload()
+
+        res = self.client.get(
+            image_url(self.recipe.id, 'thumbnail'),
+            HTTP_ACCEPT='image/webp,image/*'
+        )
+
+        self.assertTrue(res['Location'].endswith('.webp'))
+
+    def test_image_derivative_unknown_size(self):
+
+        self.upload()
+
+        res = self.client.get(image_url(self.recipe.id, 'huge'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_image_derivative_no_image(self):
+
+        res = self.client.get(image_url(self.recipe.id, 'thumbnail'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_image_urls_listed(self):
+        """Test recipes link to each derivative size"""
+
+        self.upload()
+
+        res = self.client.get(get_details_url(self.recipe.id))
+
+        self.assertEqual(
+            set(res.data['image_urls']),
+            {'thumbnail', 'full'}
+        )
+        self.assertTrue(
+            res.data['image_urls']['thumbnail'].endswith(
+                image_url(self.recipe.id, 'thumbnail')
+            )
+        )
+
+    def test_derivatives_removed_with_image(self):
+        """Test deleting an image removes its derivatives"""
+
+        self.upload()
+        self.client.get(image_url(self.recipe.id, 'thumbnail'))
+
+        name = derivative_name(self.recipe.image.name, 'thumbnail', 'jpg')
+
+        self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+
+        self.assertFalse(default_storage.exists(name))
+
     def test_upload_image_bad_request(self):
         """Test uploading invalid image"""
 
@@ -0,0 +1,183 @@
+import json
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from decimal import Decimal
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient
+)
+from recipe.bulk import import_recipes
+from recipe.cache import get_version
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_user(email='test@example.com', password='password@testuser'):
+
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def recipe_line(i, **kwargs):
+
+    recipe = {
+        'title': f'Recipe {i}',
+        'time_minutes': 10,
+        'price': '5.50',
+        'description': 'Imported recipe',
+        'tags': [{'name': 'Imported'}],
+        'ingredients': [{'name': f'Ingredient {i}'}, {'name': 'Salt'}],
+    }
+    recipe.update(kwargs)
+
+    return json.dumps(recipe)
+
+
+def read_results(res):
+
+    return [
+        json.loads(line)
+        for line in b''.join(res.streaming_content).splitlines()
+    ]
+
+
+class PublicRecipeBulkAPITests(TestCase):
+
+    def test_auth_required(self):
+
+        res = APIClient().post(
+            BULK_URL, '', content_type='application/x-ndjson'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeBulkAPITests(TestCase):
+    """Test bulk importing recipes from JSON Lines"""
+
+    def setUp(self):
+
+        self.user = create_user()
+
+        self.client = APIClient()
+
+        self.client.force_authenticate(self.user)
+
+    def post_lines(self, lines):
+
+        return self.client.post(
+            BULK_URL,
+            '\n'.join(lines) + '\n',
+            content_type='application/x-ndjson'
+        )
+
+    def test_bulk_import(self):
+        """Test every valid line creates a recipe with its relations"""
+
+        res = self.post_lines([recipe_line(i) for i in range(3)])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        results = read_results(res)
+
+        self.assertEqual(results[-1], {'created': 3, 'failed': 0})
+
+        for number, result in enumerate(results[:-1], start=1):
+            self.assertEqual(result['line'], number)
+            self.assertEqual(result['status'], 'created')
+
+        recipe = Recipe.objects.get(id=results[0]['id'])
+
+        self.assertEqual(recipe.user, self.user)
+        self.assertEqual(recipe.title, 'Recipe 0')
+        self.assertEqual(recipe.price, Decimal('5.50'))
+        self.assertEqual(recipe.description, 'Imported recipe')
+        self.assertEqual(
+            sorted(recipe.ingredients.values_list('name', flat=True)),
+            ['Ingredient 0', 'Salt']
+        )
+
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 4)
+
+    def test_bulk_import_reuses_existing_names(self):
+        """Test existing tags are linked instead of duplicated"""
+
+        tag = Tag.objects.create(user=self.user, name='Imported')
+
+        res = self.post_lines([recipe_line(0)])
+
+        recipe = Recipe.objects.get(id=read_results(res)[0]['id'])
+
+        self.assertEqual(list(recipe.tags.all()), [tag])
+
+    def test_bulk_import_reports_invalid_lines(self):
+        """Test invalid lines are reported and valid lines still created"""
+
+        lines = [
+            recipe_line(0),
+            '{not json',
+            recipe_line(2, time_minutes='soon'),
+            '',
+            recipe_line(4),
+        ]
+
+        res = self.post_lines(lines)
+
+        results = read_results(res)
+
+        self.assertEqual(
+            [(result['line'], result['status']) for result in results[:-1]],
+            [(1, 'created'), (2, 'error'), (3, 'error'), (5, 'created')]
+        )
+        self.assertIn('time_minutes', results[2]['errors'])
+        self.assertEqual(results[-1], {'created': 2, 'failed': 2})
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(RECIPE_BULK_CHUNK_SIZE=2)
+    def test_partial_import_invalidates_cache(self):
+        """Test chunks committed before an import stops bump the version"""
+
+        version = get_version(self.user.pk)
+
+        results = import_recipes(
+            [recipe_line(i, tags=[], ingredients=[]) for i in range(6)],
+            {'request': SimpleNamespace(user=self.user)},
+            settings.RECIPE_BULK_CHUNK_SIZE
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            next(results)
+            results.close()
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+        self.assertNotEqual(get_version(self.user.pk), version)
+
+    @override_settings(RECIPE_BULK_CHUNK_SIZE=10)
+    def test_bulk_import_queries_per_chunk(self):
+        """Test the number of queries grows with chunks, not recipes"""
+
+        lines = [recipe_line(i) for i in range(30)]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.post_lines(lines)
+            results = read_results(res)
+
+        self.assertEqual(results[-1], {'created': 30, 'failed': 0})
+
+        # Per chunk: savepoint, recipe insert, lookup, insert and read back
+        # of new names plus one link insert and one recipe count update per
+        # relation, search vector update, savepoint release.
+        self.assertLessEqual(len(queries), 3 * 13)
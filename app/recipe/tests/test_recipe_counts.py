@@ -0,0 +1,144 @@
+import json
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from decimal import Decimal
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_user(email='test@example.com', password='password@testuser'):
+
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **kwargs):
+
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 5,
+        'price': Decimal('5.05'),
+    }
+    defaults.update(kwargs)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeCountTests(TestCase):
+    """Test tags and ingredients keep count of their recipes"""
+
+    def setUp(self):
+
+        self.user = create_user()
+
+        self.client = APIClient()
+
+        self.client.force_authenticate(self.user)
+
+    def counts(self, model):
+
+        return dict(
+            model.objects.filter(
+                user=self.user
+            ).values_list('name', 'recipe_count')
+        )
+
+    def test_counts_on_create_and_update(self):
+        """Test counts follow the links made through the recipe API"""
+
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': Decimal('5.00'),
+            'tags': [{'name': 'Dinner'}, {'name': 'Indian'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+        payload['tags'] = [{'name': 'Dinner'}, {'name': 'Dinner'}]
+        self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(self.counts(Tag), {'Dinner': 2, 'Indian': 1})
+
+        self.client.patch(
+            reverse('recipe:recipe-detail', args=[res.data['id']]),
+            {'tags': [{'name': 'Indian'}, {'name': 'Spicy'}]},
+            format='json'
+        )
+
+        self.assertEqual(
+            self.counts(Tag),
+            {'Dinner': 1, 'Indian': 1, 'Spicy': 1}
+        )
+
+    def test_counts_on_recipe_delete(self):
+
+        recipe = create_recipe(self.user)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice')
+        )
+
+        self.client.delete(reverse('recipe:recipe-detail', args=[recipe.id]))
+
+        self.assertEqual(self.counts(Ingredient), {'Rice': 0})
+
+    def test_counts_on_related_manager_changes(self):
+        """Test counts follow add, remove and clear from either side"""
+
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        other = Tag.objects.create(user=self.user, name='Quick')
+        recipes = [create_recipe(self.user) for i in range(3)]
+
+        recipes[0].tags.add(tag, other)
+        recipes[0].tags.add(tag)
+        tag.recipe_set.add(*recipes)
+
+        self.assertEqual(self.counts(Tag), {'Vegan': 3, 'Quick': 1})
+
+        tag.recipe_set.remove(recipes[1])
+        recipes[0].tags.remove(other, other)
+
+        self.assertEqual(self.counts(Tag), {'Vegan': 2, 'Quick': 0})
+
+        recipes[2].tags.clear()
+        tag.recipe_set.clear()
+
+        self.assertEqual(self.counts(Tag), {'Vegan': 0, 'Quick': 0})
+
+    def test_counts_on_bulk_import(self):
+
+        lines = [
+            json.dumps({
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'ingredients': [{'name': 'Salt'}, {'name': f'Ingredient {i}'}],
+            })
+            for i in range(3)
+        ]
+
+        res = self.client.post(
+            BULK_URL,
+            '\n'.join(lines),
+            content_type='application/x-ndjson'
+        )
+        b''.join(res.streaming_content)
+
+        self.assertEqual(
+            self.counts(Ingredient),
+            {
+                'Salt': 3,
+                'Ingredient 0': 1,
+                'Ingredient 1': 1,
+                'Ingredient 2': 1,
+            }
+        )
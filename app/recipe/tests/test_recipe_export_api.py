@@ -0,0 +1,177 @@
+import csv
+import io
+import json
+
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from decimal import Decimal
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient
+)
+
+EXPORT_URL = reverse('recipe:recipe-export')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_user(email='test@example.com', password='password@testuser'):
+
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **kwargs):
+
+    defaults = {
+        "title": "Sample recipe title",
+        "time_minutes": 5,
+        "price": Decimal("5.05"),
+        "description": "Test recipe description.",
+        "link": "http://example.com/recipe.pdf"
+    }
+
+    defaults.update(kwargs)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def read_content(res):
+
+    return b''.join(res.streaming_content).decode()
+
+
+class PrivateRecipeExportAPITests(TestCase):
+    """Test exporting recipes"""
+
+    def setUp(self):
+
+        self.user = create_user()
+
+        self.client = APIClient()
+
+        self.client.force_authenticate(self.user)
+
+        self.recipe = create_recipe(user=self.user, title='Curry')
+        self.recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Dinner'),
+            Tag.objects.create(user=self.user, name='Indian'),
+        )
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'),
+        )
+
+    def test_export_ndjson(self):
+        """Test recipes are exported one JSON object per line"""
+
+        other = create_recipe(user=self.user, title='Toast')
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in read_content(res).splitlines()]
+
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [other.id, self.recipe.id]
+        )
+        self.assertEqual(rows[1]['title'], 'Curry')
+        self.assertEqual(rows[1]['price'], '5.05')
+        self.assertEqual(
+            rows[1]['tags'],
+            [{'name': 'Dinner'}, {'name': 'Indian'}]
+        )
+        self.assertEqual(rows[1]['ingredients'], [{'name': 'Rice'}])
+        self.assertEqual(rows[0]['tags'], [])
+
+    def test_export_csv(self):
+        """Test recipes are exported as CSV with a header row"""
+
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+
+        rows = list(csv.DictReader(io.StringIO(read_content(res))))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Curry')
+        self.assertEqual(rows[0]['tags'], 'Dinner;Indian')
+        self.assertEqual(rows[0]['ingredients'], 'Rice')
+
+    def test_export_invalid_type(self):
+
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_limited_to_user(self):
+
+        other_user = create_user(email='other@example.com')
+        create_recipe(user=other_user)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(len(read_content(res).splitlines()), 1)
+
+    def test_export_filtered(self):
+        """Test the tags filter applies to the export"""
+
+        create_recipe(user=self.user, title='Toast')
+        tag = self.recipe.tags.get(name='Indian')
+
+        res = self.client.get(EXPORT_URL, {'tags': tag.id})
+
+        rows = [json.loads(line) for line in read_content(res).splitlines()]
+
+        self.assertEqual([row['id'] for row in rows], [self.recipe.id])
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_queries_per_chunk(self):
+        """Test relations are fetched once per chunk, not per recipe"""
+
+        for i in range(5):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(EXPORT_URL)
+            lines = read_content(res).splitlines()
+
+        self.assertEqual(len(lines), 6)
+
+        # One cursor query plus two relation lookups for each of 3 chunks.
+        self.assertLessEqual(len(queries), 1 + 3 * 2)
+
+    def test_export_round_trips_through_bulk_import(self):
+        """Test an NDJSON export can be imported again"""
+
+        content = read_content(self.client.get(EXPORT_URL))
+
+        res = self.client.post(
+            BULK_URL,
+            content,
+            content_type='application/x-ndjson'
+        )
+
+        results = [
+            json.loads(line)
+            for line in b''.join(res.streaming_content).splitlines()
+        ]
+
+        self.assertEqual(results[-1], {'created': 1, 'failed': 0})
+
+        recipe = Recipe.objects.get(id=results[0]['id'])
+
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Dinner', 'Indian']
+        )
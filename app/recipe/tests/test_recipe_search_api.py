@@ -0,0 +1,198 @@
+import json
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_user(email='test@example.com', password='password@testuser'):
+
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class PrivateRecipeSearchAPITests(TestCase):
+    """Test full-text search of recipes"""
+
+    def setUp(self):
+
+        self.user = create_user()
+
+        self.client = APIClient()
+
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, **kwargs):
+
+        payload = {
+            'title': 'Sample recipe',
+            'time_minutes': 10,
+            'price': '5.00',
+            'description': '',
+        }
+        payload.update(kwargs)
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        return Recipe.objects.get(id=res.data['id'])
+
+    def search(self, text, **params):
+
+        res = self.client.get(RECIPE_URL, {'search': text, **params})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_search_fields(self):
+        """Test title, description and ingredient names are searched"""
+
+        by_title = self.create_recipe(title='Mushroom risotto')
+        by_description = self.create_recipe(
+            title='Pie',
+            description='Wild mushrooms in a crust'
+        )
+        by_ingredient = self.create_recipe(
+            title='Omelette',
+            ingredients=[{'name': 'Mushroom'}, {'name': 'Eggs'}]
+        )
+        self.create_recipe(title='Pancakes')
+
+        self.assertEqual(
+            self.search('mushroom'),
+            [by_title.id, by_ingredient.id, by_description.id]
+        )
+
+    def test_search_stems_words(self):
+        """Test words match regardless of their inflection"""
+
+        recipe = self.create_recipe(title='Baked apples')
+
+        self.assertEqual(self.search('bake apple'), [recipe.id])
+        self.assertEqual(self.search('apple -baked'), [])
+
+    def test_search_limited_to_user(self):
+
+        other_user = create_user(email='other@example.com')
+        Recipe.objects.create(
+            user=other_user,
+            title='Mushroom soup',
+            time_minutes=5,
+            price='1.00'
+        )
+
+        self.assertEqual(self.search('mushroom'), [])
+
+    def test_search_with_tag_filter(self):
+        """Test search composes with the tags filter"""
+
+        tagged = self.create_recipe(
+            title='Lentil soup',
+            tags=[{'name': 'Vegan'}]
+        )
+        self.create_recipe(title='Chicken soup')
+        tag = Tag.objects.get(user=self.user, name='Vegan')
+
+        self.assertEqual(self.search('soup', tags=tag.id), [tagged.id])
+
+    def test_search_paginated(self):
+        """Test walking the pages of search results returns each once"""
+
+        recipes = [
+            self.create_recipe(title='Tomato soup', description='Tomato ' * i)
+            for i in range(5)
+        ]
+        self.create_recipe(title='Bread')
+
+        res = self.client.get(RECIPE_URL, {'search': 'tomato', 'page_size': 2})
+        ids = [recipe['id'] for recipe in res.data['results']]
+
+        while res.data['next']:
+            self.assertIn('search=tomato', res.data['next'])
+            res = self.client.get(res.data['next'])
+            ids.extend(recipe['id'] for recipe in res.data['results'])
+
+        self.assertEqual(ids, self.search('tomato', page_size=10))
+        self.assertEqual(sorted(ids), sorted(recipe.id for recipe in recipes))
+
+    def test_search_pages_with_equal_ranks(self):
+        """Test every page size returns each result once when ranks tie"""
+
+        recipes = [
+            self.create_recipe(title='Tomato soup', description='Tomato ' * i)
+            for i in range(5)
+        ] + [self.create_recipe(title='Tomato salad') for i in range(12)]
+
+        for page_size in range(1, 8):
+            res = self.client.get(
+                RECIPE_URL,
+                {'search': 'tomato', 'page_size': page_size}
+            )
+            ids = [recipe['id'] for recipe in res.data['results']]
+
+            while res.data['next'] and len(ids) <= len(recipes):
+                res = self.client.get(res.data['next'])
+                ids.extend(recipe['id'] for recipe in res.data['results'])
+
+            self.assertEqual(
+                sorted(ids),
+                sorted(recipe.id for recipe in recipes)
+            )
+
+    def test_search_after_update(self):
+        """Test edited titles are searchable"""
+
+        recipe = self.create_recipe(title='Curry')
+
+        self.client.patch(
+            reverse('recipe:recipe-detail', args=[recipe.id]),
+            {'title': 'Green curry'}
+        )
+
+        self.assertEqual(self.search('green'), [recipe.id])
+
+    def test_search_after_ingredient_renamed(self):
+        """Test renaming an ingredient updates the recipes using it"""
+
+        recipe = self.create_recipe(
+            title='Salad',
+            ingredients=[{'name': 'Lettuce'}]
+        )
+        ingredient = Ingredient.objects.get(user=self.user, name='Lettuce')
+
+        self.client.patch(
+            reverse('recipe:ingredient-detail', args=[ingredient.id]),
+            {'name': 'Rocket'}
+        )
+
+        self.assertEqual(self.search('rocket'), [recipe.id])
+        self.assertEqual(self.search('lettuce'), [])
+
+    def test_search_bulk_imported(self):
+        """Test recipes created by the bulk import are searchable"""
+
+        line = json.dumps({
+            'title': 'Imported stew',
+            'time_minutes': 10,
+            'price': '5.00',
+        })
+
+        res = self.client.post(
+            BULK_URL,
+            line + '\n',
+            content_type='application/x-ndjson'
+        )
+        b''.join(res.streaming_content)
+
+        self.assertEqual(len(self.search('stew')), 1)
@@ -13,6 +13,7 @@ from core.models import (
 from decimal import Decimal
 
 TAGS_URL = reverse('recipe:tag-list')
+AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
 
 def get_detail_url(id):
 
@@ -57,7 +58,7 @@ class PrivateTagApiTestCase(TestCase):
 
         tags = Tag.objects.all().order_by('-name')
 
-        serializer = serializers.TagSerializer(tags, many=True)
+        serializer = serializers.TagDetailSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
@@ -75,7 +76,7 @@ class PrivateTagApiTestCase(TestCase):
 
         tags = Tag.objects.filter(user=self.user).order_by('-name')
 
-        serializer = serializers.TagSerializer(tags, many=True)
+        serializer = serializers.TagDetailSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
@@ -97,6 +98,20 @@ class PrivateTagApiTestCase(TestCase):
 
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name_error(self):
+
+        create_tag(user=self.user, name="Tag1")
+
+        tag = create_tag(user=self.user, name="Tag2")
+
+        res = self.client.patch(get_detail_url(tag.id), {'name': 'Tag1'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        tag.refresh_from_db()
+
+        self.assertEqual(tag.name, "Tag2")
+
     def test_delete_tag(self):
 
         tag = create_tag(user=self.user, name="Tag1")
@@ -123,13 +138,14 @@ class PrivateTagApiTestCase(TestCase):
         )
 
         recipe.tags.add(tag1)
+        tag1.refresh_from_db()
 
         res = self.client.get(TAGS_URL, {"assigned_only": 1})
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-        s1 = serializers.TagSerializer(tag1)
-        s2 = serializers.TagSerializer(tag2)
+        s1 = serializers.TagDetailSerializer(tag1)
+        s2 = serializers.TagDetailSerializer(tag2)
 
         self.assertIn(s1.data, res.data)
         self.assertNotIn(s2.data, res.data)
@@ -163,6 +179,16 @@ class PrivateTagApiTestCase(TestCase):
 
         self.assertEqual(len(res.data), 1)
 
+    def test_autocomplete_tags(self):
+        """Test tags are completed from a prefix of their name"""
 
+        breakfast = create_tag(user=self.user, name='Breakfast')
+        create_tag(user=self.user, name='Dinner')
 
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'BRE'})
 
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [tag['id'] for tag in res.data],
+            [breakfast.id]
+        )
@@ -5,6 +5,7 @@ from django.urls import (
 
 from rest_framework.routers import DefaultRouter
 
+from core.async_views import pooled_patterns
 from recipe import views
 
 router = DefaultRouter()
@@ -15,5 +16,10 @@ router.register('ingredient', views.IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(pooled_patterns(router.urls, [
+        'recipe-list',
+        'recipe-detail',
+        'tag-list',
+        'ingredient-list',
+    ]))),
 ]
\ No newline at end of file
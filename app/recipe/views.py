@@ -4,6 +4,19 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
+import hashlib
+import json
+
+from django.db.models import (
+    Count,
+    Exists,
+    OuterRef,
+)
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import parse_etags, quote_etag
 from rest_framework import (
     viewsets,
     mixins,
@@ -11,10 +24,25 @@ from rest_framework import (
 )
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
 from recipe import serializers
+from recipe.bulk import import_recipes
+from recipe.export import EXPORT_FORMATS, iter_recipes
+from recipe.images import stage_image
+from recipe.derivatives import choose_format, get_or_create_derivative
+from recipe.cache import CachedListMixin, get_version
+from recipe.search import (
+    autocomplete_names,
+    search_recipes,
+    update_search_vectors,
+)
+from user.authentication import CachedTokenAuthentication
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeSearchPagination,
+)
+from core.metrics import SerializerMetricsMixin
 from core.models import (
     Recipe,
     Tag,
@@ -33,47 +61,271 @@ from core.models import (
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma seperated list of ingredient IDs to filter'
+            ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Return recipes having any (default) or all '
+                            'of the listed tags and ingredients'
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Search titles, descriptions and ingredient '
+                            'names; results are ordered by relevance'
+            ),
+            OpenApiParameter(
+                'offset',
+                OpenApiTypes.INT,
+                description='Number of search results to skip; search '
+                            'results are paged by offset, not cursor'
             )
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(SerializerMetricsMixin,
+                    CachedListMixin,
+                    viewsets.ModelViewSet):
     """View for the manage recipe APIs"""
 
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+
+    @property
+    def paginator(self):
+        """Page search results by offset, see RecipeSearchPagination."""
+        if not hasattr(self, '_paginator') and (
+            self.request.query_params.get('search')
+        ):
+            self._paginator = RecipeSearchPagination()
+
+        return super().paginator
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _filter_related(self, queryset, through, field, ids, match_all):
+        """Filter recipes on an M2M relation without joining it.
+
+        The lookup runs as a semi-join against the through table so the
+        recipe rows never need to be de-duplicated with DISTINCT.
+        """
+        ids = set(ids)
+        links = through.objects.filter(**{f'{field}__in': ids})
+
+        if match_all:
+            matching = links.values('recipe_id').annotate(
+                matched=Count(field, distinct=True)
+            ).filter(matched=len(ids)).values('recipe_id')
+            return queryset.filter(id__in=matching)
+
+        return queryset.filter(Exists(links.filter(recipe_id=OuterRef('pk'))))
+
     def get_queryset(self):
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match_all = self.request.query_params.get('match') == 'all'
 
         queryset = self.queryset
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_related(
+                queryset, Recipe.tags.through, 'tag_id', tag_ids, match_all
+            )
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = self._filter_related(
+                queryset,
+                Recipe.ingredients.through,
+                'ingredient_id',
+                ingredient_ids,
+                match_all
+            )
+
+        queryset = queryset.filter(user=self.request.user).order_by('-id')
+
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = search_recipes(queryset, search).order_by(
+                '-rank', '-id'
+            )
+
+        return self._setup_eager_loading(queryset)
 
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+    def _setup_eager_loading(self, queryset):
+        """Let the serializer for this action prefetch what it renders."""
+        serializer_class = self.get_serializer_class()
+
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+
+        return queryset
+
+    def _etag(self, *parts):
+        """Return a strong ETag for the given version parts."""
+        parts = (self.request.user.pk, self.request.get_full_path()) + parts
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        return quote_etag(digest)
+
+    def _conditional_response(self, etag, view, *args, **kwargs):
+        """Return 304 if the client has etag, else run the view."""
+        if_none_match = self.request.headers.get('If-None-Match')
+
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            if '*' in etags or etag in etags:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                response['ETag'] = etag
+                return response
+
+        response = view(self.request, *args, **kwargs)
+
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        """List the authenticated user's recipes."""
+        # The list ETag reuses the per-user response cache version.
+        etag = self._etag(get_version(request.user.pk))
+
+        return self._conditional_response(
+            etag, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a recipe."""
+        # Versioned by updated_at, read without loading the whole recipe.
+        try:
+            updated_at = Recipe.objects.filter(
+                user=request.user,
+                pk=kwargs[self.lookup_field],
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            updated_at = None
+
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        return self._conditional_response(
+            self._etag(updated_at), super().retrieve, *args, **kwargs
+        )
 
     def get_serializer_class(self):
 
         if self.action == 'list':
             return serializers.RecipeSerializer
-        elif self.action == 'upload_image':
+        elif self.action in ('upload_image', 'image'):
             return serializers.RecipeImageSerializer
 
         return self.serializer_class
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+        self.invalidate_cache()
+
+    @extend_schema(
+        request={'application/x-ndjson': OpenApiTypes.BINARY},
+        responses={(200, 'application/x-ndjson'): OpenApiTypes.BINARY},
+        description='Create recipes from a JSON Lines body, one recipe '
+                    'per line. Returns one JSON result per line followed '
+                    'by a summary.'
+    )
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+
+        results = import_recipes(
+            request.stream or [],
+            self.get_serializer_context(),
+            settings.RECIPE_BULK_CHUNK_SIZE
+        )
+
+        return StreamingHttpResponse(
+            (json.dumps(result) + '\n' for result in results),
+            content_type='application/x-ndjson'
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'type',
+                OpenApiTypes.STR, enum=['ndjson', 'csv'],
+                description='Export file type, ndjson (default) or csv'
+            ),
+        ],
+        responses={
+            (200, 'application/x-ndjson'): OpenApiTypes.BINARY,
+            (200, 'text/csv'): OpenApiTypes.BINARY,
+        },
+        description='Export every recipe matching the tags and ingredients '
+                    'filters. NDJSON lines can be posted back to bulk/.'
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+
+        export_type = request.query_params.get('type', 'ndjson')
+
+        if export_type not in EXPORT_FORMATS:
+            return Response(
+                {'type': [f'Must be one of: {", ".join(EXPORT_FORMATS)}.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        write_lines, content_type = EXPORT_FORMATS[export_type]
+        rows = iter_recipes(
+            self.get_queryset(),
+            settings.RECIPE_EXPORT_CHUNK_SIZE
+        )
+
+        response = StreamingHttpResponse(
+            write_lines(rows),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_type}"'
+        )
+
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'size',
+                OpenApiTypes.STR,
+                OpenApiParameter.PATH,
+                enum=sorted(settings.RECIPE_IMAGE_DERIVATIVES),
+            ),
+        ],
+        responses={302: None, 404: None},
+        description='Redirect to a resized copy of the recipe image, '
+                    'generating it on first request. WebP is served to '
+                    'clients accepting image/webp, JPEG otherwise.'
+    )
+    @action(
+        methods=['GET'],
+        detail=True,
+        url_path=r'image/(?P<size>[a-z]+)',
+        url_name='image'
+    )
+    def image(self, request, pk=None, size=None):
+
+        recipe = self.get_object()
+
+        if size not in settings.RECIPE_IMAGE_DERIVATIVES or not recipe.image:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        ext = choose_format(request.headers.get('Accept'))
+        name = get_or_create_derivative(recipe.image, size, ext)
+
+        response = HttpResponseRedirect(default_storage.url(name))
+        response['Vary'] = 'Accept'
+
+        return response
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
@@ -82,8 +334,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            stage_image(recipe, serializer.validated_data['image'])
+            self.invalidate_cache()
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -98,13 +351,17 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ]
     )
 )
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
+class BaseRecipeAttrViewSet(SerializerMetricsMixin,
+                            CachedListMixin,
+                            mixins.DestroyModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.ListModelMixin,
                             viewsets.GenericViewSet):
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    autocomplete_limit = 10
+    max_autocomplete_limit = 50
 
     def get_queryset(self):
 
@@ -115,24 +372,94 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin,
         queryset = self.queryset
 
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(recipe_count__gt=0)
 
         return queryset.filter(
             user=self.request.user
-            ).order_by('-name').distinct()
+            ).order_by('-name')
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                required=True,
+                description='Text to complete; typos are tolerated'
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of names to return (default 10, '
+                            'at most 50)'
+            ),
+        ],
+        description='Return the names best completing q, those starting '
+                    'with it first.'
+    )
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request):
+
+        text = request.query_params.get('q', '').strip()
+
+        try:
+            limit = int(
+                request.query_params.get('limit', self.autocomplete_limit)
+            )
+        except ValueError:
+            return Response(
+                {'limit': ['A valid integer is required.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        limit = max(1, min(limit, self.max_autocomplete_limit))
+
+        if not text:
+            return Response([])
+
+        queryset = autocomplete_names(
+            self.queryset.filter(user=request.user),
+            text,
+            limit
+        )
+        serializer = self.get_serializer(queryset, many=True)
+
+        return Response(serializer.data)
+
+    def _touch_recipes(self, instance):
+        """Mark the recipes using instance as changed."""
+        instance.recipe_set.update(updated_at=timezone.now())
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self._touch_recipes(serializer.instance)
+
+    def perform_destroy(self, instance):
+        self._touch_recipes(instance)
+        super().perform_destroy(instance)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
+    """Manage tags in the database."""
 
-    serializer_class = serializers.TagSerializer
+    serializer_class = serializers.TagDetailSerializer
     queryset = Tag.objects.all()
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
+    """Manage ingredients in the database."""
 
-    serializer_class = serializers.IngredientSerializer
+    serializer_class = serializers.IngredientDetailSerializer
     queryset = Ingredient.objects.all()
 
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        update_search_vectors(serializer.instance.recipe_set.all())
+
+    def perform_destroy(self, instance):
+        recipe_ids = list(instance.recipe_set.values_list('id', flat=True))
+        super().perform_destroy(instance)
+        update_search_vectors(Recipe.objects.filter(id__in=recipe_ids))
+
 
 
 
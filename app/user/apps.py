@@ -0,0 +1,23 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+
+class UserConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'user'
+
+    def ready(self):
+        from user.authentication import (
+            invalidate_deleted_token,
+            invalidate_user_tokens,
+        )
+
+        post_delete.connect(
+            invalidate_deleted_token,
+            sender='authtoken.Token'
+        )
+        post_save.connect(
+            invalidate_user_tokens,
+            sender=settings.AUTH_USER_MODEL
+        )
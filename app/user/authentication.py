@@ -0,0 +1,177 @@
+"""
+Cached token authentication for the API views.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenLRUCache:
+    """Thread safe in-process LRU of resolved tokens with a TTL."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + settings.TOKEN_AUTH_CACHE_TTL
+
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > settings.TOKEN_AUTH_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = TokenLRUCache()
+
+
+def _cache_key(key):
+    """Return the cache key for a token without exposing the token."""
+    return 'token-auth:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _shared_cache():
+    """Return the shared cache backend, if one is configured."""
+    if settings.TOKEN_AUTH_SHARED_CACHE:
+        return caches[settings.TOKEN_AUTH_SHARED_CACHE]
+
+    return None
+
+
+def _revocation_cache():
+    return caches[settings.TOKEN_AUTH_REVOCATION_CACHE]
+
+
+def _revocation_key(cache_key):
+    return cache_key + ':revoked'
+
+
+def _unless_revoked(cached, revoked):
+    """Return cached unless its token was revoked since it was looked up.
+
+    Entries hold the revocation marker read before their lookup; entries
+    cached by earlier versions of this module have none.
+    """
+    if cached is not None and cached[2:] == (revoked,):
+        return cached
+
+    return None
+
+
+def invalidate_token(key):
+    """Revoke the cached copies of a token in every process.
+
+    The local and shared caches are cleared, and a new revocation marker
+    tells other processes to drop their local copy. The marker outlives
+    any copy cached before it.
+    """
+    cache_key = _cache_key(key)
+
+    _revocation_cache().set(
+        _revocation_key(cache_key),
+        time.time_ns(),
+        max(
+            settings.TOKEN_AUTH_CACHE_TTL,
+            settings.TOKEN_AUTH_SHARED_CACHE_TTL
+        )
+    )
+    local_cache.delete(cache_key)
+
+    shared_cache = _shared_cache()
+    if shared_cache is not None:
+        shared_cache.delete(cache_key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the resolved token and user.
+
+    Lookups go to the in-process LRU first, then to the shared cache when
+    ``TOKEN_AUTH_SHARED_CACHE`` names one, and only then to the database.
+
+    Deleting a token or saving its user sets a revocation marker in the
+    ``TOKEN_AUTH_REVOCATION_CACHE``, which must be shared by every worker.
+    Cached copies remember the marker read before they were looked up,
+    and are only used while it is unchanged, so every request reads the
+    marker but other workers never accept a revoked token.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+
+        # Read before the lookups, so a revocation racing them is seen
+        revoked = _revocation_cache().get(_revocation_key(cache_key))
+
+        cached = _unless_revoked(local_cache.get(cache_key), revoked)
+
+        if cached is None:
+            shared_cache = _shared_cache()
+            if shared_cache is not None:
+                cached = _unless_revoked(shared_cache.get(cache_key), revoked)
+                if cached is not None:
+                    local_cache.set(cache_key, cached)
+
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            cached = (user, token, revoked)
+            local_cache.set(cache_key, cached)
+
+            shared_cache = _shared_cache()
+            if shared_cache is not None:
+                shared_cache.set(
+                    cache_key,
+                    cached,
+                    settings.TOKEN_AUTH_SHARED_CACHE_TTL
+                )
+
+        # Every request gets its own copies so views can modify them freely.
+        user = copy.copy(cached[0])
+        token = copy.copy(cached[1])
+        token.user = user
+
+        return (user, token)
+
+
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    if created:
+        return
+
+    for key in Token.objects.filter(
+        user_id=instance.pk
+    ).values_list('key', flat=True):
+        invalidate_token(key)
@@ -0,0 +1,195 @@
+"""
+TEST FOR THE CACHED TOKEN AUTHENTICATION
+"""
+import subprocess
+import sys
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenLRUCache, local_cache
+
+URL_ME = reverse('user:me')
+
+
+def create_user(**kwargs):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(**kwargs)
+
+
+def token_queries(queries):
+    """Return the captured queries that looked up a token."""
+    return [
+        query['sql'] for query in queries.captured_queries
+        if Token._meta.db_table in query['sql']
+    ]
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the token authentication cache"""
+
+    def setUp(self):
+        local_cache.clear()
+
+        self.user = create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_resolved_from_cache(self):
+        """Test the second request does not query the token table"""
+
+        res = self.client.get(URL_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(URL_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        self.assertEqual(token_queries(queries), [])
+
+    def test_invalid_token_rejected(self):
+        """Test unknown tokens are rejected"""
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(URL_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        """Test deleting a token removes it from the cache"""
+
+        self.client.get(URL_ME)
+
+        self.token.delete()
+
+        res = self.client.get(URL_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test deactivating a user removes their token from the cache"""
+
+        self.client.get(URL_ME)
+
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(URL_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoked_in_other_workers(self):
+        """Test other workers drop a token revoked by this one"""
+
+        other_worker = TokenLRUCache()
+
+        with patch('user.authentication.local_cache', other_worker):
+            res = self.client.get(URL_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+
+        with patch('user.authentication.local_cache', other_worker):
+            res = self.client.get(URL_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.user.is_active = True
+        self.user.save()
+
+        with patch('user.authentication.local_cache', other_worker):
+            self.client.get(URL_ME)
+
+        self.token.delete()
+
+        with patch('user.authentication.local_cache', other_worker):
+            res = self.client.get(URL_ME)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalidation_connected_without_views(self):
+        """Test processes that never load the API still invalidate tokens"""
+
+        code = (
+            'import sys, django\n'
+            'django.setup()\n'
+            'from django.db.models.signals import post_delete, post_save\n'
+            'from django.contrib.auth import get_user_model\n'
+            'from rest_framework.authtoken.models import Token\n'
+            'assert "user.views" not in sys.modules\n'
+            'assert "invalidate_deleted_token" in [receiver.__name__ '
+            'for receiver in post_delete._live_receivers(Token)]\n'
+            'assert "invalidate_user_tokens" in [receiver.__name__ '
+            'for receiver in post_save._live_receivers(get_user_model())]\n'
+        )
+
+        subprocess.run([sys.executable, '-c', code], check=True)
+
+    def test_updated_user_not_stale(self):
+        """Test updating the profile is reflected on the next request"""
+
+        self.client.get(URL_ME)
+
+        res = self.client.patch(URL_ME, {'name': 'Updated Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(URL_ME)
+
+        self.assertEqual(res.data['name'], 'Updated Name')
+
+    @override_settings(TOKEN_AUTH_CACHE_TTL=10)
+    @patch('user.authentication.time.monotonic')
+    def test_cached_token_expires(self, patched_monotonic):
+        """Test cached tokens are looked up again after the TTL"""
+
+        patched_monotonic.return_value = 100
+        self.client.get(URL_ME)
+
+        patched_monotonic.return_value = 111
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(URL_ME)
+
+        self.assertEqual(len(token_queries(queries)), 1)
+
+    @override_settings(TOKEN_AUTH_CACHE_SIZE=1)
+    def test_least_recently_used_token_evicted(self):
+        """Test the cache holds at most TOKEN_AUTH_CACHE_SIZE tokens"""
+
+        other_user = create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        other_token = Token.objects.create(user=other_user)
+
+        self.client.get(URL_ME)
+
+        other_client = APIClient()
+        other_client.credentials(
+            HTTP_AUTHORIZATION=f'Token {other_token.key}'
+        )
+        other_client.get(URL_ME)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(URL_ME)
+
+        self.assertEqual(len(token_queries(queries)), 1)
@@ -1,11 +1,12 @@
 from django.urls import path
 
+from core.async_views import pooled_patterns
 from user import views
 
 app_name = 'user'
 
-urlpatterns = [
+urlpatterns = pooled_patterns([
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
     path('me/', views.ManageUsersView.as_view(), name='me')
-]
+], ['me'])
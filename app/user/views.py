@@ -2,12 +2,14 @@ from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
 )
-from rest_framework import generics, authentication, permissions
+from user.authentication import CachedTokenAuthentication
+from core.metrics import SerializerMetricsMixin
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(SerializerMetricsMixin, generics.CreateAPIView):
     """Create a new user in the system"""
 
     serializer_class = UserSerializer
@@ -17,10 +19,11 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
-class ManageUsersView(generics.RetrieveUpdateAPIView):
+class ManageUsersView(SerializerMetricsMixin,
+                      generics.RetrieveUpdateAPIView):
 
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
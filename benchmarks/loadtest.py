@@ -0,0 +1,614 @@
+"""
+LOAD TEST FOR THE RECIPE AND USER APIS
+
+Drives a weighted mix of API calls against a running server with a
+number of concurrent clients, then reports latency percentiles,
+requests per second and SQL queries per request, and stores everything
+as JSON so runs can be compared across commits.
+
+Only the standard library is used, so it runs from the host against the
+docker-compose stack:
+
+    docker-compose up
+    python benchmarks/loadtest.py run --concurrency 8 --duration 60
+    python benchmarks/loadtest.py compare old.json new.json
+
+sweep repeats the run at several concurrencies, which shows how many
+clients a server setup handles before latency climbs; see the README
+for comparing the uWSGI and ASGI run modes with it.
+
+Each client signs up its own user and creates --recipes recipes before
+the clock starts.
+
+The proxy answers more than 5 sign-ins or sign-ups a second from one
+address with 429, see proxy/default.conf.tpl. The clients share a
+--password-rate of such requests, 4 a second by default, which is spent
+on signing up before the clock starts and on the token operation after.
+A token operation drawn when there is none left is drawn again, and
+the clients go on with the tokens they got when signing up. Use
+--password-rate 0 for no limit when testing a server without the proxy,
+which is the only way to measure sign-ins beyond that rate.
+
+Queries per request are read from the /metrics endpoint of the server,
+so they are only reported when it is reachable with the METRICS_TOKEN of
+the server (--metrics-token, by default the METRICS_TOKEN environment
+variable); the endpoint is denied without one.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import struct
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+# Operation name: (method, view name used in the server metrics)
+OPERATIONS = {
+    'token': ('POST', 'user:token'),
+    'recipe-list': ('GET', 'recipe:recipe-list'),
+    'recipe-detail': ('GET', 'recipe:recipe-detail'),
+    'recipe-create': ('POST', 'recipe:recipe-list'),
+    'recipe-patch': ('PATCH', 'recipe:recipe-detail'),
+    'tag-list': ('GET', 'recipe:tag-list'),
+    'ingredient-list': ('GET', 'recipe:ingredient-list'),
+    'upload-image': ('POST', 'recipe:recipe-upload-image'),
+}
+
+# Relative weights of the operations in each mix
+MIXES = {
+    'browse': {
+        'recipe-list': 40,
+        'recipe-detail': 30,
+        'tag-list': 10,
+        'ingredient-list': 10,
+        'token': 5,
+        'recipe-create': 3,
+        'recipe-patch': 2,
+    },
+    'mixed': {
+        'recipe-list': 25,
+        'recipe-detail': 20,
+        'tag-list': 10,
+        'ingredient-list': 10,
+        'token': 5,
+        'recipe-create': 15,
+        'recipe-patch': 12,
+        'upload-image': 3,
+    },
+    'write': {
+        'recipe-detail': 10,
+        'token': 10,
+        'recipe-create': 40,
+        'recipe-patch': 30,
+        'upload-image': 10,
+    },
+}
+
+TAGS = ['Vegan', 'Dinner', 'Quick', 'Dessert', 'Breakfast', 'Spicy']
+INGREDIENTS = [
+    'Salt', 'Pepper', 'Garlic', 'Onion', 'Tomato', 'Rice', 'Flour',
+    'Butter', 'Eggs', 'Milk', 'Chicken', 'Lentils', 'Basil', 'Lemon',
+]
+
+
+def png(width, height, seed):
+    """Return a PNG image of random colours, without needing Pillow."""
+    rng = random.Random(seed)
+    rows = b''.join(
+        b'\x00' + bytes(rng.randrange(256) for i in range(width * 3))
+        for j in range(height)
+    )
+
+    def chunk(kind, data):
+        return (
+            struct.pack('>I', len(data)) + kind + data +
+            struct.pack('>I', zlib.crc32(kind + data))
+        )
+
+    return (
+        b'\x89PNG\r\n\x1a\n' +
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)) +
+        chunk(b'IDAT', zlib.compress(rows)) +
+        chunk(b'IEND', b'')
+    )
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+
+    return values[max(0, int(round(fraction * len(values))) - 1)]
+
+
+class Pacer:
+    """Spaces requests evenly at rate a second, shared by all clients."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.due = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, wait=True):
+        """Claim the next request, waiting until it is due.
+
+        Without wait, return False instead if it is not due yet.
+        """
+        with self.lock:
+            now = time.monotonic()
+            due = self.due
+            if due > now and not wait:
+                return False
+            self.due = max(due, now) + self.interval
+
+        time.sleep(max(0, due - now))
+        return True
+
+
+class Client:
+    """One simulated user with its own keep-alive connection."""
+
+    def __init__(self, base_url, index, run_id, rng, pacer):
+        url = urlsplit(base_url)
+        connection_class = (
+            http.client.HTTPSConnection if url.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        self.connection = connection_class(url.hostname, url.port)
+        self.rng = rng
+        self.pacer = pacer
+        self.email = f'bench-{run_id}-{index}@example.com'
+        self.password = 'benchmark-password'
+        self.token = None
+        self.recipes = []
+
+    def request(self, method, path, body=None, content_type=None):
+        """Send a request and return its status and decoded JSON body."""
+        headers = {}
+        if self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        if body is not None and content_type is None:
+            body = json.dumps(body)
+            content_type = 'application/json'
+        if content_type:
+            headers['Content-Type'] = content_type
+
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            raise
+
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+    def recipe_payload(self):
+        return {
+            'title': f'Benchmark recipe {self.rng.randrange(10 ** 6)}',
+            'time_minutes': self.rng.randrange(5, 120),
+            'price': f'{self.rng.uniform(1, 50):.2f}',
+            'description': 'A recipe created by the load test.',
+            'tags': [
+                {'name': name} for name in self.rng.sample(TAGS, 2)
+            ],
+            'ingredients': [
+                {'name': name} for name in self.rng.sample(INGREDIENTS, 5)
+            ],
+        }
+
+    def set_up(self, recipes):
+        """Sign up, log in and create the starting recipes."""
+        self.pacer.take()
+        status, body = self.request('POST', '/api/user/create/', {
+            'email': self.email,
+            'password': self.password,
+            'name': 'Benchmark',
+        })
+        if status != 201:
+            raise RuntimeError(f'Could not create user: {status} {body}')
+
+        self.pacer.take()
+        status = self.token_op()
+        if status != 200:
+            raise RuntimeError(f'Could not get a token: {status}')
+
+        for i in range(recipes):
+            self.recipe_create_op()
+
+    def token_op(self):
+        status, body = self.request('POST', '/api/user/token/', {
+            'email': self.email,
+            'password': self.password,
+        })
+        if status == 200:
+            self.token = body['token']
+
+        return status
+
+    def recipe_list_op(self):
+        return self.request('GET', '/api/recipe/recipes/')[0]
+
+    def recipe_detail_op(self):
+        recipe_id = self.rng.choice(self.recipes)
+
+        return self.request('GET', f'/api/recipe/recipes/{recipe_id}/')[0]
+
+    def recipe_create_op(self):
+        status, body = self.request(
+            'POST',
+            '/api/recipe/recipes/',
+            self.recipe_payload()
+        )
+        if status == 201:
+            self.recipes.append(body['id'])
+
+        return status
+
+    def recipe_patch_op(self):
+        recipe_id = self.rng.choice(self.recipes)
+        payload = self.recipe_payload()
+        if self.rng.random() < 0.5:
+            del payload['tags'], payload['ingredients']
+
+        return self.request(
+            'PATCH',
+            f'/api/recipe/recipes/{recipe_id}/',
+            payload
+        )[0]
+
+    def tag_list_op(self):
+        return self.request('GET', '/api/recipe/tags/')[0]
+
+    def ingredient_list_op(self):
+        return self.request('GET', '/api/recipe/ingredient/')[0]
+
+    def upload_image_op(self):
+        recipe_id = self.rng.choice(self.recipes)
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\n'
+            'Content-Disposition: form-data; name="image"; '
+            'filename="benchmark.png"\r\n'
+            'Content-Type: image/png\r\n\r\n'
+        ).encode() + png(64, 64, self.rng.random()) + (
+            f'\r\n--{boundary}--\r\n'
+        ).encode()
+
+        return self.request(
+            'POST',
+            f'/api/recipe/recipes/{recipe_id}/upload-image/',
+            body,
+            f'multipart/form-data; boundary={boundary}'
+        )[0]
+
+    def run(self, operation):
+        method = getattr(self, operation.replace('-', '_') + '_op')
+
+        return method()
+
+
+def read_metrics(base_url, token):
+    """Return SQL query sums and counts by (view, method) from /metrics."""
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port)
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+    try:
+        connection.request('GET', '/metrics', headers=headers)
+        response = connection.getresponse()
+        text = response.read().decode()
+    except (http.client.HTTPException, OSError):
+        return None
+    finally:
+        connection.close()
+
+    if response.status != 200:
+        return None
+
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for line in text.splitlines():
+        if not line.startswith('django_http_request_db_queries_'):
+            continue
+        name, _, value = line.rpartition(' ')
+        metric, _, labels = name.partition('{')
+        labels = dict(
+            part.split('=', 1) for part in labels.rstrip('}').split(',')
+        )
+        key = (labels['view'].strip('"'), labels['method'].strip('"'))
+        if metric.endswith('_sum'):
+            totals[key][0] += float(value)
+        elif metric.endswith('_count'):
+            totals[key][1] += float(value)
+
+    return totals
+
+
+def run(args):
+    mix = MIXES[args.mix]
+    operations = list(mix)
+    weights = [mix[operation] for operation in operations]
+    run_id = uuid.uuid4().hex[:8]
+    pacer = Pacer(args.password_rate)
+
+    clients = [
+        Client(args.url, i, run_id, random.Random(f'{args.seed}-{i}'), pacer)
+        for i in range(args.concurrency)
+    ]
+    for client in clients:
+        client.set_up(args.recipes)
+
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    measuring = threading.Event()
+    stopping = threading.Event()
+
+    def work(client):
+        while not stopping.is_set():
+            operation = client.rng.choices(operations, weights)[0]
+            if operation == 'token' and not pacer.take(wait=False):
+                continue
+
+            start = time.perf_counter()
+            try:
+                status = client.run(operation)
+            except (http.client.HTTPException, OSError):
+                status = None
+            latency = time.perf_counter() - start
+
+            if measuring.is_set() and not stopping.is_set():
+                with lock:
+                    samples[operation].append(latency)
+                    if status is None or status >= 400:
+                        errors[operation] += 1
+
+    threads = [
+        threading.Thread(target=work, args=(client,), daemon=True)
+        for client in clients
+    ]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(args.warmup)
+    metrics_before = read_metrics(args.url, args.metrics_token)
+    measuring.set()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stopping.set()
+    elapsed = time.perf_counter() - started
+    for thread in threads:
+        thread.join()
+    metrics_after = read_metrics(args.url, args.metrics_token)
+
+    results = {}
+    for operation in operations:
+        latencies = sorted(samples[operation])
+        method, view = OPERATIONS[operation]
+        queries = None
+        if metrics_before is not None and metrics_after is not None:
+            after = metrics_after.get((view, method), [0, 0])
+            before = metrics_before.get((view, method), [0, 0])
+            sampled = after[1] - before[1]
+            if sampled:
+                queries = (after[0] - before[0]) / sampled
+
+        results[operation] = {
+            'requests': len(latencies),
+            'errors': errors[operation],
+            'requests_per_second': len(latencies) / elapsed,
+            'p50_ms': ms(percentile(latencies, 0.50)),
+            'p95_ms': ms(percentile(latencies, 0.95)),
+            'p99_ms': ms(percentile(latencies, 0.99)),
+            'queries_per_request': queries,
+        }
+
+    total = sorted(
+        latency for latencies in samples.values() for latency in latencies
+    )
+
+    return {
+        'run': run_id,
+        'created': time.time(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'settings': {
+            'url': args.url,
+            'mix': args.mix,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'recipes': args.recipes,
+            'seed': args.seed,
+            'password_rate': args.password_rate,
+        },
+        'total': {
+            'requests': len(total),
+            'errors': sum(errors.values()),
+            'requests_per_second': len(total) / elapsed,
+            'p50_ms': ms(percentile(total, 0.50)),
+            'p95_ms': ms(percentile(total, 0.95)),
+            'p99_ms': ms(percentile(total, 0.99)),
+        },
+        'operations': results,
+    }
+
+
+def ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def fmt(value, spec='.1f'):
+    return '-' if value is None else format(value, spec)
+
+
+def print_report(result):
+    print(f'{"operation":<16} {"reqs":>7} {"err":>5} {"req/s":>8} '
+          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}')
+    rows = list(result['operations'].items()) + [('total', result['total'])]
+    for operation, stats in rows:
+        print(f'{operation:<16} {stats["requests"]:>7} {stats["errors"]:>5} '
+              f'{fmt(stats["requests_per_second"]):>8} '
+              f'{fmt(stats["p50_ms"]):>8} {fmt(stats["p95_ms"]):>8} '
+              f'{fmt(stats["p99_ms"]):>8} '
+              f'{fmt(stats.get("queries_per_request")):>8}')
+
+
+def compare(old, new):
+    """Print the change of each figure between two stored runs."""
+    print(f'{old.get("commit")} -> {new.get("commit")}')
+    print(f'{"operation":<16} {"figure":<20} {"old":>9} {"new":>9} '
+          f'{"change":>8}')
+
+    rows = [('total', old['total'], new['total'])] + [
+        (operation, stats, new['operations'][operation])
+        for operation, stats in old['operations'].items()
+        if operation in new['operations']
+    ]
+    for operation, before, after in rows:
+        for figure in ('requests_per_second', 'p50_ms', 'p95_ms', 'p99_ms',
+                       'queries_per_request'):
+            a, b = before.get(figure), after.get(figure)
+            change = f'{(b - a) / a:+.1%}' if a and b is not None else '-'
+            print(f'{operation:<16} {figure:<20} {fmt(a):>9} {fmt(b):>9} '
+                  f'{change:>8}')
+
+
+def compare_sweeps(old, new):
+    """Print the totals of two sweeps side by side per concurrency."""
+    print(f'{old.get("label") or old.get("commit")} -> '
+          f'{new.get("label") or new.get("commit")}')
+    print(f'{"clients":>7} {"figure":<20} {"old":>9} {"new":>9} '
+          f'{"change":>8}')
+
+    new_runs = {run['settings']['concurrency']: run for run in new['runs']}
+    for before in old['runs']:
+        concurrency = before['settings']['concurrency']
+        if concurrency not in new_runs:
+            continue
+
+        after = new_runs[concurrency]
+        for figure in ('requests_per_second', 'p50_ms', 'p99_ms', 'errors'):
+            a, b = before['total'][figure], after['total'][figure]
+            change = f'{(b - a) / a:+.1%}' if a and b is not None else '-'
+            print(f'{concurrency:>7} {figure:<20} {fmt(a):>9} {fmt(b):>9} '
+                  f'{change:>8}')
+
+
+def store(result, args, name):
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        'results',
+        f'{result["commit"] or "unknown"}-{name}.json'
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'Results stored in {output}', file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    load = argparse.ArgumentParser(add_help=False)
+    load.add_argument('--url', default='http://127.0.0.1:8000')
+    load.add_argument('--mix', choices=MIXES, default='mixed')
+    load.add_argument('--duration', type=float, default=30,
+                      help='seconds to measure')
+    load.add_argument('--warmup', type=float, default=5,
+                      help='seconds to run before measuring')
+    load.add_argument('--recipes', type=int, default=20,
+                      help='recipes each client creates up front')
+    load.add_argument('--seed', default='recipe-app')
+    load.add_argument('--password-rate', type=float, default=4,
+                      help='sign-ins and sign-ups a second, 0 for no limit')
+    load.add_argument('--metrics-token',
+                      default=os.environ.get('METRICS_TOKEN'))
+    load.add_argument('--label',
+                      help='name of the setup under test, like wsgi or asgi')
+    load.add_argument('--output', help='file to store the results in')
+
+    run_parser = commands.add_parser('run', parents=[load],
+                                     help='run a load test')
+    run_parser.add_argument('--concurrency', type=int, default=8)
+
+    sweep_parser = commands.add_parser(
+        'sweep',
+        parents=[load],
+        help='run a load test at each concurrency, to find where a server '
+             'stops scaling'
+    )
+    sweep_parser.add_argument('--concurrency', type=int, nargs='+',
+                              default=[1, 4, 16, 32, 64])
+
+    compare_parser = commands.add_parser('compare',
+                                         help='compare two stored results')
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        with open(args.old) as old, open(args.new) as new:
+            old, new = json.load(old), json.load(new)
+        if 'runs' in old and 'runs' in new:
+            compare_sweeps(old, new)
+        else:
+            compare(old, new)
+        return
+
+    name = '-'.join(filter(None, [args.label, args.mix]))
+
+    if args.command == 'run':
+        result = run(args)
+        result['label'] = args.label
+        print_report(result)
+        store(result, args, f'{name}-{result["run"]}')
+        return
+
+    runs = []
+    for concurrency in args.concurrency:
+        print(f'{concurrency} clients', file=sys.stderr)
+        runs.append(run(argparse.Namespace(
+            **{**vars(args), 'concurrency': concurrency}
+        )))
+        print_report(runs[-1])
+
+    store({
+        'label': args.label,
+        'commit': runs[0]['commit'],
+        'created': time.time(),
+        'runs': runs,
+    }, args, f'{name}-sweep-{runs[0]["run"]}')
+
+
+if __name__ == '__main__':
+    main()
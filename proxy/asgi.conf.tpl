@@ -0,0 +1,32 @@
+# Sign-ins and sign-ups hash a password, see app/core/hashers.py
+# benchmarks/loadtest.py keeps under the rate with --password-rate
+limit_req_zone $binary_remote_addr zone=password:10m rate=5r/s;
+
+server {
+
+    listen ${LISTEN_PORT};
+
+    location /static {
+        alias /vol/static;
+    }
+
+    location /api/recipe/recipes/bulk/ {
+        proxy_pass http://${APP_HOST}:${APP_PORT};
+        include /etc/nginx/proxy_params;
+        client_max_body_size 0;
+        proxy_request_buffering off;
+    }
+
+    location ~ ^/(api/user/(token|create)|admin/login)/$ {
+        proxy_pass http://${APP_HOST}:${APP_PORT};
+        include /etc/nginx/proxy_params;
+        limit_req zone=password burst=10 nodelay;
+        limit_req_status 429;
+    }
+
+    location / {
+        proxy_pass http://${APP_HOST}:${APP_PORT};
+        include /etc/nginx/proxy_params;
+        client_max_body_size 10M;
+    }
+}
\ No newline at end of file
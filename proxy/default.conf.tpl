@@ -1,3 +1,7 @@
+# Sign-ins and sign-ups hash a password, see app/core/hashers.py
+# benchmarks/loadtest.py keeps under the rate with --password-rate
+limit_req_zone $binary_remote_addr zone=password:10m rate=5r/s;
+
 server {
 
     listen ${LISTEN_PORT};
@@ -6,6 +10,20 @@ server {
         alias /vol/static;
     }
 
+    location /api/recipe/recipes/bulk/ {
+        uwsgi_pass ${APP_HOST}:${APP_PORT};
+        include /etc/nginx/uwsgi_params;
+        client_max_body_size 0;
+        uwsgi_request_buffering off;
+    }
+
+    location ~ ^/(api/user/(token|create)|admin/login)/$ {
+        uwsgi_pass ${APP_HOST}:${APP_PORT};
+        include /etc/nginx/uwsgi_params;
+        limit_req zone=password burst=10 nodelay;
+        limit_req_status 429;
+    }
+
     location / {
         uwsgi_pass ${APP_HOST}:${APP_PORT};
         include /etc/nginx/uwsgi_params;
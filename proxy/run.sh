@@ -2,6 +2,14 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
+# APP_SERVER=asgi proxies plain HTTP to uvicorn instead of uwsgi
+if [ "$APP_SERVER" = "asgi" ]; then
+    TEMPLATE=/etc/nginx/asgi.conf.tpl
+else
+    TEMPLATE=/etc/nginx/default.conf.tpl
+fi
+
+envsubst '${LISTEN_PORT} ${APP_HOST} ${APP_PORT}' < $TEMPLATE \
+    > /etc/nginx/conf.d/default.conf
 
 nginx -g 'daemon off;'
\ No newline at end of file
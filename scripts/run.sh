@@ -6,5 +6,25 @@ python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
+# Uploads queued by workers of the previous run that never processed them
+python manage.py process_images
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+# Metrics files of the previous run belong to workers that no longer exist
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"/*
+fi
+
+# APP_SERVER=asgi serves HTTP with uvicorn instead of the uwsgi protocol;
+# the proxy must be started with the same APP_SERVER.
+if [ "$APP_SERVER" = "asgi" ]; then
+    exec uvicorn app.asgi:application --host 0.0.0.0 --port 9000 \
+        --workers "${WORKERS:-4}" --proxy-headers --forwarded-allow-ips '*'
+fi
+
+# Workers, recycling and the cheaper subsystem are sized from the container
+# limits; WORKERS, THREADS, WORKER_MEMORY_MB and MAX_REQUESTS override them.
+# Options are printed one per line, as some contain spaces.
+set -f
+IFS='
+'
+exec uwsgi $(uwsgi_config.py)
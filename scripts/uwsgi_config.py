@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+Print uWSGI options sized for the CPU and memory of the container.
+
+The limits come from the cgroup (v2, then v1) and fall back to the
+host. Up to WORKERS workers are allowed, by default 2 per CPU plus one
+as long as WORKER_MEMORY_MB each fits in three quarters of the memory.
+uWSGI's cheaper subsystem starts one worker per CPU and spawns the rest
+only while every worker is busy. The app is loaded and warmed up in the
+master, so workers share its memory copy-on-write, and workers are
+recycled after MAX_REQUESTS requests or when they grow past
+RELOAD_ON_RSS_MB. Workers finish their queued image uploads before
+exiting, and the master runs process_images every five minutes for any
+a worker could not finish.
+
+Options are printed one per line, see run.sh.
+"""
+import math
+import os
+import sys
+
+UNLIMITED = 2 ** 60
+
+
+def read(path):
+    try:
+        with open(path) as f:
+            return f.read().split()
+    except OSError:
+        return None
+
+
+def cpu_limit():
+    """Return the CPUs the container may use."""
+    cpus = len(os.sched_getaffinity(0))
+
+    quota = read('/sys/fs/cgroup/cpu.max')
+    if quota and quota[0] != 'max':
+        return min(cpus, math.ceil(int(quota[0]) / int(quota[1])))
+
+    quota = read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    period = read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota and period and int(quota[0]) > 0:
+        return min(cpus, math.ceil(int(quota[0]) / int(period[0])))
+
+    return cpus
+
+
+def memory_limit_mb():
+    """Return the memory the container may use, in MB."""
+    limit = read('/sys/fs/cgroup/memory.max')
+    if not limit or limit[0] == 'max':
+        limit = read('/sys/fs/cgroup/memory/memory.limit_in_bytes')
+
+    if limit and limit[0] != 'max' and int(limit[0]) < UNLIMITED:
+        return int(limit[0]) // 2 ** 20
+
+    meminfo = read('/proc/meminfo')
+    return int(meminfo[meminfo.index('MemTotal:') + 1]) // 1024
+
+
+def env_int(name, default):
+    return int(os.environ.get(name) or default)
+
+
+def options():
+    cpus = cpu_limit()
+    memory = memory_limit_mb()
+    worker_memory = env_int('WORKER_MEMORY_MB', 150)
+
+    workers = env_int(
+        'WORKERS',
+        max(1, min(2 * cpus + 1, memory * 3 // 4 // worker_memory))
+    )
+    threads = env_int('THREADS', 1)
+    cheaper = env_int('CHEAPER', min(cpus, workers - 1))
+
+    print(
+        f'uWSGI: {cpus} CPU, {memory} MB: up to {workers} workers '
+        f'of {threads} thread(s), {cheaper or workers} at start',
+        file=sys.stderr
+    )
+
+    args = [
+        '--socket', ':9000',
+        '--module', 'app.wsgi',
+        '--master',
+        '--die-on-term',
+        '--need-app',
+        '--enable-threads',
+        '--env', 'WSGI_WARMUP=1',
+        '--workers', workers,
+        '--max-requests', env_int('MAX_REQUESTS', 5000),
+        '--reload-on-rss', env_int('RELOAD_ON_RSS_MB', 2 * worker_memory),
+        '--worker-reload-mercy', 30,
+        '--unique-cron', '-5 -1 -1 -1 -1 python manage.py process_images',
+    ]
+
+    if threads > 1:
+        args += ['--threads', threads]
+
+    if cheaper > 0:
+        args += [
+            '--cheaper-algo', 'spare',
+            '--cheaper', cheaper,
+            '--cheaper-initial', cheaper,
+            '--cheaper-step', 1,
+        ]
+
+    return [str(arg) for arg in args]
+
+
+if __name__ == '__main__':
+    print('\n'.join(options()))